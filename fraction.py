@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from math import modf, floor
+import os
+import sys
+from math import modf
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import rational  # noqa: E402
 
 tropical_year = 365.242190  # 臺北市立天文科學教育館：《天文年鑑2019》，頁 374，太陽年。
 synodic_month = 29.530589  # 臺北市立天文科學教育館：《天文年鑑2019》，頁 375，朔望月。
@@ -10,23 +15,18 @@ synodic_month = 29.530589  # 臺北市立天文科學教育館：《天文年鑑
 def find_fraction(number, max_denominator, special_case = []):
     decimal_part, integer_part = modf(number)
     print('target: ', decimal_part, integer_part)
-    min_e = 1
-    for i in range(2, max_denominator):
-        denominator = i
-        numerator = denominator * decimal_part
-        dp, _ = modf(numerator)
-        if dp >= 0.5:
-            numerator = floor(numerator) + 1
-        else:
-            numerator = floor(numerator)
-        e = abs(numerator/denominator - decimal_part)
-        if e < min_e:
-            print('{0:4d}/{1:4d}, {2:0.8f}, {3:0.8f}'.format(numerator,
-                                                             denominator,  numerator/denominator, e))
-            min_e = e
-        elif denominator in special_case:
-            print('{0:4d}/{1:4d}, {2:0.8f}, {3:0.8f} [*]'.format(numerator,
-                                                             denominator,  numerator/denominator, e))
+    results = rational.best_approximations(decimal_part, max_denominator - 1, 2)
+    found = {a.denominator for a in results}
+    for denominator in special_case:
+        if denominator not in found:
+            numerator = int(round(denominator * decimal_part))
+            results.append(rational.Approximation(numerator, denominator, numerator / denominator,
+                                                  numerator / denominator - decimal_part))
+    results.sort(key=lambda a: a.denominator)
+    for a in results:
+        print('{0:4d}/{1:4d}, {2:0.8f}, {3:0.8f}{4}'.format(a.numerator, a.denominator, a.value, abs(a.error),
+                                                           '' if a.denominator in found else ' [*]'))
+    return results
 
 
 if __name__ == "__main__":
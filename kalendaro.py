@@ -1,14 +1,29 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
-from math import floor
+import argparse
+import os
+import re
+import sys
 
+import numpy as np
 from jdcal import jd2gcal, jd2jcal, gcal2jd
-from pytz import timezone
-from skyfield import almanac
 from skyfield.api import load
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools'))
+import batch  # noqa: E402
+import constants  # noqa: E402
+import ephemerides  # noqa: E402
+import event_cache  # noqa: E402
+import event_join  # noqa: E402
+import ganzhi  # noqa: E402
+import inscription  # noqa: E402
+import lunisolar  # noqa: E402
+import parallel  # noqa: E402
+import table_writer  # noqa: E402
+import timezones  # noqa: E402
+import ziyu_day  # noqa: E402
+
 season_name_dict = {0: '春分', 1: '夏至', 2: '秋分', 3: '冬至'}
 moon_phase_name_dict = {0: ' 朔 ', 1: '上弦', 2: ' 望 ', 3: '下弦'}
 
@@ -19,11 +34,10 @@ synodic_month = 29.530589  # 臺北市立天文科學教育館：《天文年鑑
 tropical_year_jacobs = 365.24219264  # Astronomical Constants Index, Code `YT`
 synodic_month_jacobs = 29.5305888844  # Astronomical Constants Index, Code `S9`
 
+eph = ephemerides.LazyEphemeris('de422.bsp')  # covering years -3000 through 3000
 ts = load.timescale()
-td = ts.utc(2019, 11, 23)  # 甲子日(0), 星期六
-bd = ts.utc(1978, 3, 4)  # 乙丑日(1), 星期六
-tz_cst = timezone('Asia/Taipei')
-tz_gmt = timezone('Europe/London')
+tz_cst = timezones.TZ_CST
+tz_gmt = timezones.TZ_GMT
 # period 常數
 period_years = 4418
 period_months = 54643
@@ -39,48 +53,46 @@ days_of_months = [0, 30, 61, 91, 122, 152, 183, 213, 244, 274, 305, 335, 366]
 days_of_years = [0, 365, 730, 1095, 1461]
 
 
-def ganzhi_of_jd_with_delta(jd, delta):
-    return (int(floor(jd - delta + .5)) - 11) % 60
-
-
 def is_same_day(t0, t1, timezone=tz_gmt):
-    # 注意: datetime 的最小年份是 1
-    dt0 = t0.astimezone(timezone)
-    dt1 = t1.astimezone(timezone)
-    return (dt0.year == dt1.year) and (dt0.month == dt1.month) and (dt0.day == dt1.day)
+    # 以固定時差判斷民用日 (t0, t1 可為陣列), 見 timezones.py
+    return timezones.same_day(t0.tt, t1.tt, timezone, ut=True)
 
 
 def is_jiazi(t, delta):
-    return (ganzhi_of_jd_with_delta(t.tt, delta) == 0)
+    return ganzhi.day(t.tt, -delta) == 0
 
 
 def delta_day_between_timezone(tz0, tz1):
-    d0 = tz0.localize(datetime(2000, 1, 1))
-    d1 = tz1.localize(datetime(2000, 1, 1))
-    return ts.utc(d1) - ts.utc(d0)
-
-
-def find_new_moon_winter_solstice_day(start_time, end_time, timezone=tz_gmt):
-    e = load('de422.bsp')  # covering years -3000 through 3000
-    t, y = almanac.find_discrete(start_time, end_time, almanac.seasons(e))
-    dd = delta_day_between_timezone(tz_gmt, timezone)
+    return timezones.offset(tz0) - timezones.offset(tz1)
+
+
+def search_new_moon_winter_solstice_day(lo, hi, a, b, timezone, save=True):
+    """
+    求 [lo, hi) 間的朔旦冬至甲子, 朔日由 [a, b) 間的月相中尋找 (供 parallel.map_spans 分段呼叫)
+    """
+    seasons = event_cache.events(event_cache.SEASONS, lo, hi, eph.name, save)
+    moons = event_cache.events(event_cache.MOON_PHASES, a, b, eph.name, save)
+    offset = timezones.offset(timezone)
+    # 同日與甲子皆以當地民用日 (UT1 + 時區) 判斷
+    pairs = event_join.pair_solstices_new_moons(seasons, moons, offset, ut=True)
+    pairs = pairs[(np.abs(pairs['delta']) <= 1) & pairs['same_day'] & (pairs['ganzhi'] == 0)]
+    if len(pairs) == 0:  # 空的 Time 陣列無法換算日期; 分段搜尋時大部分的段都沒有
+        return []
+    # 整段一次換算 (Time 陣列), 不逐筆建立 Time
+    y, m, d = ts.tt_jd(pairs['solstice_tt']).utc[:3].astype(np.int64)
+    jd = ts.utc(y, m, d).tt
+    return list(zip(y.tolist(), m.tolist(), d.tolist(), jd.tolist(),
+                    event_join.utc_tuples(pairs['solstice_tt']), event_join.utc_tuples(pairs['new_moon_tt'])))  # 朔日
+
+
+def find_new_moon_winter_solstice_day(start_time, end_time, timezone=tz_gmt, jobs=1):
+    save = parallel.jobs_count(jobs) == 1
+    chunks = parallel.map_spans(search_new_moon_winter_solstice_day, start_time.tt, end_time.tt, jobs,
+                                overlap=2, args=(timezone, save))
     results = []
-    for yi, ti in zip(y, t):
-        if yi != 3:
-            continue
-        ti0, ti1 = ts.tt_jd(ti.tt - 1), ts.tt_jd(ti.tt + 1)
-        tnm = find_new_moon(ti0, ti1, e)  # 朔日
-        if tnm is None:
-            continue
-        if not is_same_day(ti, tnm, timezone):
-            continue
-        if not is_jiazi(ti, dd):
-            continue
-        dt = ti.utc_datetime()
-        y, m, d = dt.year, dt.month, dt.day
-        jd = ts.utc(y, m, d).tt
-        print(y, m, d, jd, ti.utc, tnm.utc)
-        results.append(jd)
+    for r in parallel.merge(chunks, key=lambda row: row[3]):
+        print(*r)
+        results.append(r[3])
     return results
 
 
@@ -94,128 +106,164 @@ def find_period_origin():
     print('第1紀 JD:', round(prev_nmwsd, 1))
 
 
-def generate_seasons_table(t0, t1):
-    if t0.tt < 625648.5:
-        t0 = ts.tt_jd(625649)
-    e = load('de422.bsp')
-    t, y = almanac.find_discrete(t0, t1, almanac.seasons(e))
+SEASONS_TABLE_COLUMNS = [
+    ('年序', 'i4'), ('分至', 'U2'), ('Season', 'i1'), ('JD', 'f8'),
+    ('年', 'i2'), ('月', 'i1'), ('日', 'i1'), ('時', 'i1'), ('分', 'i1'), ('秒', 'f8'),
+    ('子輿紀', 'i1'), ('子輿日', 'f8'), ('年干支', 'U2'),
+]
+
+SOLAR_TERMS_TABLE_COLUMNS = [
+    ('年序', 'i4'), ('節氣', 'U2'), ('節氣碼', 'i1'), ('JD', 'f8'),
+    ('年', 'i2'), ('月', 'i1'), ('日', 'i1'), ('時', 'i1'), ('分', 'i1'), ('秒', 'f8'),
+    ('子輿紀', 'i1'), ('子輿日', 'f8'), ('年干支', 'U2'),
+]
+
+CALENDAR_TABLE_COLUMNS = [
+    ('JDN', 'i8'), ('子輿日', 'i8'),
+    ('西曆年', 'i4'), ('西曆月', 'i1'), ('西曆日', 'i1'),
+    ('共和年', 'i4'), ('共和月', 'i1'), ('共和日', 'i1'),
+    ('儒略曆年', 'i4'), ('儒略曆月', 'i1'), ('儒略曆日', 'i1'),
+    ('格里曆年', 'i4'), ('格里曆月', 'i1'), ('格里曆日', 'i1'),
+    ('日干支', 'U2'), ('日干支序', 'i1'), ('星期', 'U3'),
+]
+
+EVENTS_TABLE_COLUMNS = [
+    ('天象碼', 'U3'), ('天象', 'U3'), ('JD', 'f8'),
+    ('年', 'i2'), ('月', 'i1'), ('日', 'i1'), ('時', 'i1'), ('分', 'i1'), ('秒', 'f8'),
+    ('子輿日', 'f8'), ('日干支', 'U2'), ('日干支序', 'i1'),
+]
+
+MONTHS_TABLE_COLUMNS = [
+    ('JDN', 'i8'), ('子輿日', 'i8'), ('西曆年', 'i4'), ('西曆月', 'i1'), ('西曆日', 'i1'),
+    ('月名', 'U4'), ('閏月', 'i1'), ('月建', 'U1'), ('日數', 'i1'), ('中氣', 'U2'), ('中氣數', 'i1'),
+    ('日干支', 'U2'), ('日干支序', 'i1'),
+]
+
+season_names = np.array([season_name_dict[i] for i in range(4)])
+moon_phase_names = np.array([moon_phase_name_dict[i] for i in range(4)])
+solar_term_names = np.array(lunisolar.SOLAR_TERM_NAMES)
+
+
+def build_events(jd0, jd1, jobs, kinds=(event_cache.SEASONS, event_cache.MOON_PHASES)):
+    """ jobs 大於 1 時, 先以 process pool 分段求出 [jd0, jd1) 的天象並存入快取 """
+    if parallel.jobs_count(jobs) != 1:
+        for kind in kinds:
+            event_cache.build(kind, jd0, jd1, eph.name, jobs)
+
+
+def calendar_table(jdn):
+    """ 各曆日期對照 (陣列版, 同 gonghe_calendar.to_row), 傳回 CALENDAR_TABLE_COLUMNS 各欄陣列 """
+    jdn = np.asarray(jdn, dtype=np.int64)
+    zd = jdn - constants.JDN_ZD0
+    ganzhi_order = (jdn - 11) % 60
+    return dict(zip([name for name, _ in CALENDAR_TABLE_COLUMNS], [
+        jdn, zd, *batch.jdn2cal_batch(jdn), *batch.zd2tcal_batch(zd)[:3],
+        *batch.jdn2jcal_batch(jdn), *batch.jdn2gcal_batch(jdn),
+        ganzhi.NAMES[ganzhi_order], ganzhi_order + 1, ganzhi.WEEKDAY_NAMES[(jdn + 1) % 7]]))
+
+
+def generate_calendar_table(jdn0, jdn1, writer=None, chunk_rows=table_writer.CHUNK_ROWS):
+    """ [jdn0, jdn1) 逐日的各曆對照表, 分批寫出 """
+    writer = writer or table_writer.CsvTableWriter(None, CALENDAR_TABLE_COLUMNS)
+    for lo in range(jdn0, jdn1, chunk_rows):
+        writer.write(calendar_table(np.arange(lo, min(lo + chunk_rows, jdn1))))
+        writer.flush()
+    writer.close()
+
+
+def months_table(jd0, jd1, timezone=0.0, ut=False, start=lunisolar.JIANYIN):
+    """ [jd0, jd1) 間開始的陰陽曆月 (無中氣置閏), 傳回 MONTHS_TABLE_COLUMNS 各欄陣列, 月名依歲首 start """
+    months = lunisolar.month_table(jd0, jd1, eph.name, timezone, ut)
+    jdn = months['start_zd'].astype(np.int64) + constants.JDN_ZD0
+    ganzhi_order = (jdn - 11) % 60
+    zhongqi = np.append(lunisolar.ZHONGQI_NAMES, '')[months['zhongqi']]  # -1 (無中氣) 為空白
+    return dict(zip([name for name, _ in MONTHS_TABLE_COLUMNS], [
+        jdn, jdn - constants.JDN_ZD0, *batch.jdn2cal_batch(jdn),
+        lunisolar.month_names(months, start), months['leap'].astype(np.int8), lunisolar.BRANCH_NAMES[months['branch']],
+        months['length'], zhongqi, months['zhongqi_count'], ganzhi.NAMES[ganzhi_order], ganzhi_order + 1]))
+
+
+def generate_seasons_table(t0, t1, writer=None, chunk_rows=table_writer.CHUNK_ROWS, resume=None,
+                           block_days=10 * event_cache.CHUNK_DAYS, jobs=1):
+    """
+    分至表, 分批寫出
+    天象以 block_days 為一段依序求出 (每段求完即存入快取), 每寫完一批即 flush, 中斷後可由輸出的最後一列接續。
+    :param writer: table_writer 的 writer, None 為 csv 輸出至 stdout
+    :param resume: 上次輸出的最後一列 (見 table_writer.last_row), 由其後接續, 年序亦接續
+    :param jobs: 大於 1 時先平行求出整段天象
+    """
+    generate_year_events_table(event_cache.SEASONS, 3, season_names, SEASONS_TABLE_COLUMNS,
+                               t0, t1, writer, chunk_rows, resume, block_days, jobs)
+
+
+def generate_solar_terms_table(t0, t1, writer=None, chunk_rows=table_writer.CHUNK_ROWS, resume=None,
+                               block_days=10 * event_cache.CHUNK_DAYS, jobs=1):
+    """ 節氣表 (二十四節氣), 格式與用法同分至表, 年序亦以冬至換年 """
+    generate_year_events_table(event_cache.SOLAR_TERMS, 18, solar_term_names, SOLAR_TERMS_TABLE_COLUMNS,
+                               t0, t1, writer, chunk_rows, resume, block_days, jobs)
+
+
+def generate_year_events_table(kind, new_year_code, names, columns, t0, t1, writer=None,
+                               chunk_rows=table_writer.CHUNK_ROWS, resume=None,
+                               block_days=10 * event_cache.CHUNK_DAYS, jobs=1):
+    """ 分至表與節氣表共用: 每遇 new_year_code (冬至) 年序加一 """
+    jd0, jd1 = max(t0.tt, 625649), t1.tt
     year_no = 0
-    print('年序,分至,Season,JD,年,月,日,時,分,秒,子輿紀,子輿日,年干支')
-    for yi, ti in zip(y, t):
-        if yi == 3:
-            year_no += 1
-        season_name = season_name_dict[yi]
-        dt = ti.tt_calendar()
-        zyp, zyd = 0, ti.tt - p0_orig_jd
-        if zyd > period_days:
-            zyp, zyd = 1, ti.tt - p1_orig_jd
-        ganzhi_order = (year_no + 56) % 60
-        print('{0},{1},{2},{3},{4},{5},{6},{7},{8},{9},{10},{11},{12}'.
-              format(year_no, season_name, yi, ti.tt, *dt, zyp, zyd, ganzhi_name(ganzhi_order), ganzhi_order + 1))
-
-
-def is_in_range(t, t0, t1):
-    if t0 < t1:
-        return (t0 <= t) and (t <= t1)
-    else:
-        return (t0 <= t <= 59) or (0 <= t <= t1)
-
-
-def jinhou_su_bianzhong_kao():
-    t0, t1 = ts.tt(-999, 1, 1), ts.tt(-771, 12, 31)
-    results = []
-    e = load('de422.bsp')
-    t, y = almanac.find_discrete(t0, t1, almanac.seasons(e))
-    for yi, ti in zip(y, t):
-        astro_key = 'S_{0}'.format(yi)
-        season_name = season_name_dict[yi]
-        dt = ti.tt_calendar()
-        zyd = ti.tt - p0_orig_jd
-        ganzhi_order = int(zyd) % 60
-        ganzhi = ganzhi_name(ganzhi_order)
-        results.append([astro_key, season_name, ti.tt,
-                        *dt, zyd, ganzhi, ganzhi_order + 1])
-    t, y = almanac.find_discrete(t0, t1, almanac.moon_phases(e))
-    for yi, ti in zip(y, t):
-        astro_key = 'M_{0}'.format(yi)
-        moon_phase_name = moon_phase_name_dict[yi]
-        dt = ti.tt_calendar()
-        zyd = ti.tt - p0_orig_jd
-        ganzhi_order = int(zyd) % 60
-        ganzhi = ganzhi_name(ganzhi_order)
-        results.append([astro_key, moon_phase_name, ti.tt,
-                        *dt, zyd, ganzhi, ganzhi_order + 1])
-    results.sort(key=lambda x: x[-3])
-    print('天象碼,天象,JD,年,月,日,時,分,秒,子輿日,日干支,日干支序')
-    for r in results:
-        print('{0},{1},{2},{3},{4},{5},{6},{7},{8},{9},{10},{11}'.format(*r))
-    print('----------------')
-    first_month_found = False
-    years = {}  # year_index: months
-    months = []  # [month_indexes, month_indexes, month_indexes...]
-    month_indexes = []
-    year_index = None
-    for i, r in enumerate(results):
-        if r[0] == 'M_0':
-            month_indexes.append(i)
-        elif r[0] == 'M_1':
-            month_indexes.append(i)
-        elif r[0] == 'M_2':
-            month_indexes.append(i)
-        elif r[0] == 'M_3':
-            month_indexes.append(i)
-            if first_month_found:
-                if len(months) >= 12:
-                    years[year_index] = months
-                months = [month_indexes]
-                first_month_found = False
-            else:
-                if len(month_indexes) == 4:
-                    months.append(month_indexes)
-            month_indexes = []
-        elif r[0] == 'S_3':
-            first_month_found = True
-            year_index = i
-    for year_index, months in years.items():
-        year_key = results[year_index][3]
-        print('{0}年({1})'.format(year_key, year_index))
-        for i, month in enumerate(months):
-            mp = results[month[0]]
-            print(
-                '    {0:>2}月,{1:4d}-{2:02d}-{3:02d},{4},{5},{6}'.format(i + 1, *mp[3:6], *mp[-2:], mp[2]))
+    if resume:
+        jd0, year_no = resume['JD'], resume['年序']
+    build_events(jd0, jd1, jobs, [kind])
+    writer = writer or table_writer.CsvTableWriter(None, columns)
+    for lo in np.arange(jd0, jd1, block_days):
+        events = event_cache.events(kind, lo, min(lo + block_days, jd1), eph.name)
+        if resume:
+            events = events[events['tt'] > resume['JD']]
+        year_nos = year_no + np.cumsum(events['code'] == new_year_code)
+        if len(year_nos):
+            year_no = year_nos[-1]
+        for i in range(0, len(events), chunk_rows):
+            e, year_no_chunk = events[i:i + chunk_rows], year_nos[i:i + chunk_rows]
+            tt = np.array(e['tt'])
+            zyp = (tt - p0_orig_jd > period_days).astype(np.int8)
+            writer.write(dict(zip([name for name, _ in columns], [
+                year_no_chunk, names[e['code']], e['code'], tt, *ts.tt_jd(tt).tt_calendar(),
+                zyp, np.where(zyp, tt - p1_orig_jd, tt - p0_orig_jd), ganzhi.NAMES[(year_no_chunk + 56) % 60]])))
+            writer.flush()
+    writer.close()
+
+
+def events_table(t0, t1, timezone=0.0):
+    """ 分至與月相合併依時間排序, 傳回 EVENTS_TABLE_COLUMNS 各欄陣列, 日干支以 timezone 的當地日計 """
+    seasons = event_cache.events(event_cache.SEASONS, t0.tt, t1.tt, eph.name)
+    moons = event_cache.events(event_cache.MOON_PHASES, t0.tt, t1.tt, eph.name)
+    tt = np.concatenate([seasons['tt'], moons['tt']])
+    code = np.concatenate([seasons['code'], moons['code']])
+    is_season = np.arange(len(tt)) < len(seasons)
+    order = np.argsort(tt, kind='stable')
+    tt, code, is_season = tt[order], code[order], is_season[order]
+    zyd = tt - p0_orig_jd
+    ganzhi_order = ganzhi.day(tt, timezone)
+    return dict(zip([name for name, _ in EVENTS_TABLE_COLUMNS], [
+        np.char.add(np.where(is_season, 'S_', 'M_'), code.astype('U1')),
+        np.where(is_season, season_names[code], moon_phase_names[code]),
+        tt, *ts.tt_jd(tt).tt_calendar(), zyd, ganzhi.NAMES[ganzhi_order], ganzhi_order + 1]))
+
+
+def jinhou_su_bianzhong_kao(writer=None, chunk_rows=table_writer.CHUNK_ROWS, constraints=inscription.JINHOU_SU,
+                            t0=None, t1=None, timezone=0.0, jobs=1):
+    t0 = ts.tt(-999, 1, 1) if t0 is None else t0
+    t1 = ts.tt(-771, 12, 31) if t1 is None else t1
+    build_events(t0.tt, t1.tt + 60, jobs)
+    columns = events_table(t0, t1, timezone)
+    writer = writer or table_writer.CsvTableWriter(None, EVENTS_TABLE_COLUMNS)
+    for i in range(0, len(columns['JD']), chunk_rows):
+        writer.write({name: col[i:i + chunk_rows] for name, col in columns.items()})
+    writer.close()
     print('----------------')
-    for year_index, months in years.items():
-        for i in range(3):
-            jan_idx, feb_idx, mar_idx, _, _, jun_idx, jul_idx = months[i:i + 7]
-            jan = results[jan_idx[0]]
-            feb = results[feb_idx[0]]
-            mar = results[mar_idx[0]]
-            jun = results[jun_idx[0]]
-            jul = results[jul_idx[0]]
-            jan_range = ((jan[-1] + 59) % 60, feb[-1])
-            feb_range = ((feb[-1] + 59) % 60, mar[-1])
-            jun_range = ((jun[-1] + 59) % 60, jul[-1])
-            if year_index == 8286 and i == 2:
-                print(jan_range)
-                print(feb_range)
-                print(jun_range)
-            # check jan, 55 is one-base
-            if not is_in_range(55, *jan_range):
-                continue
-            # check feb, 39,40 is one-base
-            if not is_in_range(39, *feb_range):
-                continue
-            if not is_in_range(40, *feb_range):
-                continue
-            # check jun, 15,24,27 is one-base
-            if not is_in_range(15, *jun_range):
-                continue
-            if not is_in_range(24, *jun_range):
-                continue
-            if not is_in_range(27, *jun_range):
-                continue
-            print('{0}年{1}月,{2},{3},JD:{4}'.format(
-                results[year_index][3], i + 1, *jan[-2:], jan[2]))
+    months = inscription.month_table(t0.tt, t1.tt, eph.name, timezone)
+    matches = inscription.match(months, constraints)
+    for year, m in zip(inscription.match_years(matches).tolist(), matches):
+        print('{0}年{1}月,{2},{3},JD:{4}'.format(
+            year, m['start'] + 1, ganzhi.NAMES[m['ganzhi']], m['ganzhi'] + 1, m['new_moon_tt']))
 
 
 def jd2tcal(jd):
@@ -347,36 +395,190 @@ def print_days():
 
 
 def print_all_winter_soltices(start_time, end_time):
-    e = load('de422.bsp')
-    t, y = almanac.find_discrete(start_time, end_time, almanac.seasons(e))
-    ws_in_zd = None
-    for yi, ti in zip(y, t):
-        if yi != 3:
-            continue
-        # 以下五行檢查兩種 jd 算法是否相等
-        # dt = ti.tt_calendar()
-        # jd1 = floor(ti.tt + 0.5) - 0.5
-        # jd2 = round(ts.utc(*dt[:3]).tt, 2)
-        # if jd1 != jd2:
-        #     print(*dt[:3], jd1, jd2)
-        tdate = jd2tcal(ti.tt)
-        gdate = jd2gcal(0, ti.tt)
-        zd = jd2zd(ti.tt)
-        if ws_in_zd is None:
-            year_days = 0
-        else:
-            year_days = int(zd[1]) - ws_in_zd
-        ws_in_zd = int(zd[1])
-        print('{0},{1},{4},{2},{3}'.format(tdate, gdate, ti.tt, zd, year_days))
+    seasons = event_cache.events(event_cache.SEASONS, start_time.tt, end_time.tt, eph.name)
+    tt = np.array(seasons['tt'][seasons['code'] == 3])
+    # 整段一次換算: 共和曆, 格里曆 (同 jdcal.jd2gcal), 子輿日 (紀, 日)
+    zd = tt - p0_orig_jd
+    period = np.floor(zd / period_days)
+    zd_day = zd - period * period_days
+    jdn = np.floor(tt + .5).astype(np.int64)
+    tdates = zip(*(c.tolist() for c in batch.zd2tcal_batch(zd)))
+    gdates = zip(*(c.tolist() for c in batch.jdn2gcal_batch(jdn)), (tt + .5 - jdn).tolist())
+    zds = zip(period.astype(np.int64).tolist(), zd_day.tolist())
+    days = np.floor(zd_day).astype(np.int64)
+    year_days = np.diff(days, prepend=days[:1])
+    for tdate, gdate, jd, zd, year_day in zip(tdates, gdates, tt.tolist(), zds, year_days.tolist()):
+        print('{0},{1},{4},{2},{3}'.format(tdate, gdate, jd, zd, year_day))
+
+
+DATE_PATTERN = re.compile(r'^(-?\d+)(?:-(\d+))?(?:-(\d+))?$')
+
+
+def parse_jd(text):
+    """
+    命令列的日期轉 JD (當日 0 時)
+    'JD2451545.0': 儒略日; 'T2819-3-15': 共和曆;
+    '2000-1-1', '-999' (只有年時為 1 月 1 日): 西曆, 天文年號, 1582/10/15 之前為儒略曆 (同 gonghe_calendar.ce_to_str)
+    日依所選曆法的月大小檢查 (如 2000-2-30, 1582-10-10 不存在), 換算後再換回, 須得原日期
+    """
+    if text[:2].upper() == 'JD':
+        return float(text[2:])
+    tcal = text[:1].upper() == 'T'
+    match = DATE_PATTERN.match(text[1:] if tcal else text)
+    if match is None:
+        raise argparse.ArgumentTypeError('invalid date: {}'.format(text))
+    y, m, d = int(match.group(1)), int(match.group(2) or 1), int(match.group(3) or 1)
+    if not (1 <= m <= 12 and 1 <= d <= 31):
+        raise argparse.ArgumentTypeError('invalid date: {}'.format(text))
+    if tcal:
+        zd = float(batch.tcal2zd_batch(y, m, d))
+        valid = constants.zd2tcal(zd)[:3] == (y, m, d)
+        jd = zd + constants.JD_ZD0
+    else:
+        jdn = constants.cal2jdn(y, m, d)
+        valid = constants.jdn2cal(jdn) == (y, m, d)
+        jd = jdn - .5
+    if not valid:
+        raise argparse.ArgumentTypeError('invalid date: {}'.format(text))
+    return jd
+
+
+DATE_OPTIONS = ('--start', '--end')
+
+
+def attach_date_options(argv):
+    """
+    '--start -999-1-1' 改為 '--start=-999-1-1':
+    argparse 把 '-' 開頭且不像數值的參數 (如 -999-1-1) 當成選項, 日期選項的值須以 = 連接
+    (convert 的日期是位置參數, 負年份請放在 -- 之後: convert -- -999-1-1)
+    """
+    argv = list(argv)
+    result = []
+    while argv:
+        arg = argv.pop(0)
+        if arg in DATE_OPTIONS and argv and argv[0].startswith('-') and DATE_PATTERN.match(argv[0]):
+            arg = '{}={}'.format(arg, argv.pop(0))
+        result.append(arg)
+    return result
+
+
+def parse_timezone(text):
+    """ 時區: 數值為時差 (小時), 否則為時區名稱或地名, 見 timezones.offset """
+    try:
+        return float(text) / 24
+    except ValueError:
+        pass
+    try:
+        timezones.offset(text)
+    except KeyError:
+        raise argparse.ArgumentTypeError('unknown timezone: {}'.format(text))
+    return text
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--start', type=parse_jd, help='起始日期 (含), 如 2000-1-1, -999-1-1, T2819-3-15, JD2451545')
+    common.add_argument('--end', type=parse_jd, help='結束日期 (不含)')
+    common.add_argument('--tz', type=parse_timezone, default=0.0, help='時區: 時差 (小時), 時區名稱或地名, 預設為 UTC')
+    common.add_argument('--ephemeris', help='星曆表, 如 de422.bsp (見 ephemerides.py)')
+    common.add_argument('--jobs', type=int, default=1, help='平行計算的 process 數, 0 為 CPU 核心數')
+    table_writer.add_arguments(common)
+
+    parser = argparse.ArgumentParser(description='子輿日、共和曆與天象計算')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    convert = commands.add_parser('convert', parents=[common], help='日期換算 (各曆對照)')
+    convert.add_argument('dates', nargs='+', type=parse_jd, help='日期, 格式同 --start; 負年份放在 -- 之後, 如 convert -- -999-1-1')
+    commands.add_parser('table', parents=[common], help='逐日各曆對照表, 預設為萬年曆全範圍')
+    seasons = commands.add_parser('seasons', parents=[common], help='分至表')
+    seasons.add_argument('--resume', action='store_true', help='由輸出檔的最後一列接續 (中斷後續跑或延長)')
+    terms = commands.add_parser('solar-terms', parents=[common], help='節氣表 (二十四節氣)')
+    terms.add_argument('--resume', action='store_true', help='由輸出檔的最後一列接續 (中斷後續跑或延長)')
+    months = commands.add_parser('months', parents=[common], help='陰陽曆月表 (朔、中氣、閏月)')
+    months.add_argument('--start-month', choices=['zi', 'chou', 'yin'], default='yin', help='月名的歲首: 建子, 建丑, 建寅')
+    months.add_argument('--ut', action='store_true', help='以 UT1 判斷日期 (民用日), 預設為 TT')
+    commands.add_parser('solstice-search', parents=[common], help='求朔旦冬至甲子')
+    cycle = commands.add_parser('cycle-search', help='求回歸年與朔望月的週期 (不用星曆表, 不接受共用選項)')
+    cycle.add_argument('--max-year', type=int, default=20000, help='最大年數')
+    commands.add_parser('kao', parents=[common], help='晉侯蘇編鐘天象表與曆日比對')
+    args = parser.parse_args(attach_date_options(sys.argv[1:] if argv is None else argv))
+
+    if args.command is None:
+        parser.print_help()
+        return
+    if args.command == 'cycle-search':  # 只依 constants 的平均長度計算
+        ziyu_day.find_cycle(constants.tropical_year, constants.synodic_month, args.max_year)
+        return
+    if args.ephemeris:
+        ephemerides.use(args.ephemeris)
+    jobs = args.jobs or None
+    start = None if args.start is None else ts.tt_jd(args.start)
+    end = None if args.end is None else ts.tt_jd(args.end)
+
+    if args.command == 'convert':
+        jdn = np.floor(np.array(args.dates) + .5).astype(np.int64)
+        writer = table_writer.open_table(args.output, CALENDAR_TABLE_COLUMNS, args.format)
+        writer.write(calendar_table(jdn))
+        writer.close()
+    elif args.command == 'table':
+        jdn0 = int(np.floor(args.start + .5)) if args.start is not None else constants.JDN_WANIAN_START
+        jdn1 = int(np.floor(args.end + .5)) if args.end is not None else constants.JDN_WANIAN_END + 1
+        generate_calendar_table(jdn0, jdn1, table_writer.open_table(args.output, CALENDAR_TABLE_COLUMNS, args.format))
+    elif args.command in ('seasons', 'solar-terms'):
+        generate, columns = ((generate_seasons_table, SEASONS_TABLE_COLUMNS) if args.command == 'seasons' else
+                             (generate_solar_terms_table, SOLAR_TERMS_TABLE_COLUMNS))
+        resume = None
+        if args.resume:
+            if args.output == '-':
+                parser.error('--resume requires --output')
+            resume = table_writer.last_row(args.output, columns, args.format)
+        generate(ts.tt_jd(p0_orig_jd - 1) if start is None else start,
+                 ts.tt(2929, 12, 31) if end is None else end,
+                 table_writer.open_table(args.output, columns, args.format, append=args.resume),
+                 resume=resume, jobs=jobs)
+    elif args.command == 'months':
+        jd0 = args.start if args.start is not None else ts.now().tt - 365
+        jd1 = args.end if args.end is not None else jd0 + 3 * 365
+        build_events(jd0 - lunisolar.MARGIN_DAYS, jd1 + lunisolar.MARGIN_DAYS, jobs,
+                     [event_cache.MOON_PHASES, event_cache.SOLAR_TERMS])
+        writer = table_writer.open_table(args.output, MONTHS_TABLE_COLUMNS, args.format)
+        writer.write(months_table(jd0, jd1, args.tz, args.ut,
+                                  {'zi': lunisolar.JIANZI, 'chou': lunisolar.JIANCHOU, 'yin': lunisolar.JIANYIN}[args.start_month]))
+        writer.close()
+    elif args.command == 'solstice-search':
+        find_new_moon_winter_solstice_day(ts.utc(1, 1, 1) if start is None else start,
+                                          ts.utc(2999, 12, 31) if end is None else end, args.tz, jobs)
+    elif args.command == 'kao':
+        jinhou_su_bianzhong_kao(table_writer.open_table(args.output, EVENTS_TABLE_COLUMNS, args.format),
+                                t0=start, t1=end, timezone=args.tz, jobs=jobs)
 
 
 if __name__ == "__main__":
+    main()
+
+    # 命令列用法 (python kalendaro.py <command> -h 看各命令的選項)
+    #   python kalendaro.py convert 2000-1-1 T2819-3-15 JD2451545
+    #   python kalendaro.py convert -- -999-1-1 -2000   # 負年份的位置參數放在 -- 之後
+    #   python kalendaro.py table --start 1900 --end 2000 --format bin --output days
+    #   python kalendaro.py seasons --format bin --output seasons_table [--resume]
+    #   python kalendaro.py solar-terms --format bin --output solar_terms_table [--resume]
+    #   python kalendaro.py months --start 2000 --end 2035 --tz 8 --ut
+    #   python kalendaro.py solstice-search --start 1 --end 2999 --tz Asia/Taipei --jobs 8
+    #   python kalendaro.py solstice-search --start -999-1-1 --end 1   # 同 --start=-999-1-1
+    #   python kalendaro.py cycle-search --max-year 20000
+    #   python kalendaro.py kao --output jinhou_su.csv
+    #   共用選項 (cycle-search 以外): --start/--end/--tz/--ephemeris/--jobs, -o/--output, -f/--format
+
+    # 各種日期計算、轉換
+    # print_days()
+    # test_tcal2zd_compare()
+
     # 求朔旦冬至
     # t0 = ts.utc(1, 1, 1)
     # t1 = ts.utc(2999, 12, 31)
     # find_new_moon_winter_solstice_day(t0, t1)
     # print('----------------')
     # find_new_moon_winter_solstice_day(t0, t1, tz_cst)
+    # find_new_moon_winter_solstice_day(t0, t1, tz_cst, jobs=8)  # 分段平行搜尋
 
     # 求紀元始日
     # find_period_origin()
@@ -385,13 +587,11 @@ if __name__ == "__main__":
     # t0 = ts.tt_jd(p0_orig_jd-1)
     # t1 = ts.tt(2929, 12, 31)
     # generate_seasons_table(t0, t1)
+    # 或 python kalendaro.py seasons --format bin --output seasons_table
 
     # 晉侯酥編鐘考
     # jinhou_su_bianzhong_kao()
-
-    # 各種日期計算、轉換
-    # print_days()
-    test_tcal2zd_compare()
+    # 或 python kalendaro.py kao --output jinhou_su.csv
 
     # 列出歷年冬至的天下曆日
     # t0 = ts.tt_jd(gh_y0_jd-1)
@@ -425,12 +625,12 @@ if __name__ == "__main__":
     # tt0 = ts.utc(2019, 11, 22, 21, 0, 0).tt  # UTC 21:00, CST 05:00(次日)
     # tt1 = ts.utc(2019, 11, 23, 8, 0, 0).tt  # UTC 08:00, CST 16:00
     # tt2 = ts.utc(2019, 11, 23, 17, 0, 0).tt  # UTC 17:00, CST 01:00(後一天)
-    # print(ganzhi_name(ganzhi_of_jd_with_delta(tt0, 0))),  # 癸亥
-    # print(ganzhi_name(ganzhi_of_jd_with_delta(tt0, dd)))  # 甲子
-    # print(ganzhi_name(ganzhi_of_jd_with_delta(tt1, 0))),  # 甲子
-    # print(ganzhi_name(ganzhi_of_jd_with_delta(tt1, dd)))  # 甲子
-    # print(ganzhi_name(ganzhi_of_jd_with_delta(tt2, 0))),  # 甲子
-    # print(ganzhi_name(ganzhi_of_jd_with_delta(tt2, dd)))  # 乙丑
+    # print(ganzhi.name(ganzhi.day(tt0))),  # 癸亥
+    # print(ganzhi.name(ganzhi.day(tt0, -dd)))  # 甲子
+    # print(ganzhi.name(ganzhi.day(tt1))),  # 甲子
+    # print(ganzhi.name(ganzhi.day(tt1, -dd)))  # 甲子
+    # print(ganzhi.name(ganzhi.day(tt2))),  # 甲子
+    # print(ganzhi.name(ganzhi.day(tt2, -dd)))  # 乙丑
     # dt1 = ts.tt_jd(2086291.5004882407).utc_datetime()
     # dt2 = ts.tt_jd(2458473.500800741).utc_datetime()
     # print(dt1)
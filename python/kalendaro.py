@@ -2,11 +2,17 @@
 # -*- coding: utf-8 -*-
 
 import datetime
-from math import modf
+import os
+import sys
 
-from skyfield import api
+import numpy as np
+from skyfield import almanac, api
 from skyfield.api import load
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+import constants  # noqa: E402
+import cycle_search  # noqa: E402
+
 ts = load.timescale()
 e = api.load('de422.bsp')
 td = ts.utc(2019, 6, 26)  # 甲午日(30), 星期三
@@ -18,30 +24,28 @@ bd = ts.utc(1978, 3, 4)  # 乙丑日(1), 星期六
 
 
 def find_dzsd(t, cnt):
-    t1 = t
-    t0 = ts.tt_jd(t1.tt - 360)
-    i = 0
+    """
+    由 t 往前 cnt 個冬至中, 列出冬至日干支為癸亥、甲子 (或前 3033 ~ 3035 年) 且前後一日內有新月者
+    冬至整段一次求出, 新月先以 Time 陣列一次求月相篩選, 只對有新月的冬至求新月時刻
+    """
     head = ['冬至JD', '冬至日', '新月JD', '新月日', '干支', '星期']
     print(','.join(head))
-    while i < cnt:
-        tws = find_winter_solstice(t0, t1)
-        if tws != None:
-            i += 1
-            ganzhi = ganzhi_of_jd(tws.tt)
-            id = 2019 - i
-            if ganzhi in (59, 0) or id in [-3033, -3034, -3035]:
-                tws0, tws1 = ts.tt_jd(tws.tt - 1), ts.tt_jd(tws.tt + 1)
-                tnm = find_new_moon(tws0, tws1)
-                if tnm != None:
-                    # print(i, almanac.SEASON_EVENTS[3], tws.utc_iso(' '),)
-                    # print(i, almanac.MOON_PHASES[0], tnm.utc_iso(' '),)
-                    weekday = weekday_of_jd(tws.tt)
-                    name_gz, name_wd = ganzhi_name(ganzhi), weekday_name(weekday)
-                    delta = abs(tws.tt - tnm.tt)
-                    dzsd = [tws.tt, tws.utc_iso(' '), tnm.tt, tnm.utc_iso(), name_gz, name_wd, delta]
-                    print('[{7:4d}] {0:>6.9f},{1:>22s},{2:>6.9f},{3:>22s},{4},{5},{6:0.5f}'.format(*dzsd, id))
-        t1 = t0
-        t0 = ts.tt_jd(t1.tt - 360)
+    t_seasons, y = almanac.find_discrete(ts.tt_jd(t.tt - 366 * cnt), t, almanac.seasons(e))
+    tws = t_seasons[y == 3][::-1][:cnt]
+    ids = 2019 - np.arange(1, len(tws.tt) + 1)
+    jdn = np.floor(tws.tt + .5).astype(np.int64)
+    ganzhi = (jdn - 11) % 60
+    keep = np.isin(ganzhi, (59, 0)) | np.isin(ids, (-3033, -3034, -3035))
+    # 前後一日間月相角跨過 0 度即有新月
+    phase0 = almanac.moon_phase(e, ts.tt_jd(tws.tt[keep] - 1)).degrees
+    phase1 = almanac.moon_phase(e, ts.tt_jd(tws.tt[keep] + 1)).degrees
+    keep[keep] = phase1 < phase0
+    for tt, iso, i, gz, n in zip(tws.tt[keep], tws[keep].utc_iso(' '), ids[keep], ganzhi[keep], jdn[keep]):
+        t_moons, y = almanac.find_discrete(ts.tt_jd(tt - 1), ts.tt_jd(tt + 1), almanac.moon_phases(e))
+        tnm = t_moons[y == 0][0]
+        name_gz, name_wd = constants.ganzhi_name(gz), constants.weekdays[(n + 1) % 7]
+        dzsd = [tt, iso, tnm.tt, tnm.utc_iso(), name_gz, name_wd, abs(tt - tnm.tt)]
+        print('[{7:4d}] {0:>6.9f},{1:>22s},{2:>6.9f},{3:>22s},{4},{5},{6:0.5f}'.format(*dzsd, i))
 
 
 # 19年7閏, 391年144閏(大明曆)
@@ -49,42 +53,24 @@ special_year = [19, 76, 391, 4560]
 
 
 def find_zhang(ylen, mlen, max_year=99999):
-    min_err = 1
-    max_err = 0
-    min_err_with_ganzhi = 1
-    max_err_with_ganzhi = 0
-    for i in range(1, max_year):
-        j = round(i * ylen / mlen)
-        days_in_i_year = i * ylen
-        days_in_j_month = j * mlen
-        time_part_in_i_year, day_part_in_i_year = modf(days_in_i_year)
-        time_part_in_j_month, day_part_in_j_month = modf(days_in_j_month)
-        if int(day_part_in_i_year) != int(days_in_j_month) and i not in special_year:
-            continue
-        leap = j - i * 12
-        days = int(day_part_in_i_year)
-        err = min(time_part_in_i_year, time_part_in_j_month)
-        meet_ganzhi = ((days + 1) % 60) == 0
-        meet_week = ((days + 1) % 7) == 0
-        if err > 0.916667 and not meet_ganzhi and i not in special_year:
-            continue
-        # if err >=  min_err and i not in special_year:
-        #     continue
-        if meet_ganzhi:
-            if err < min(0.916667, max_err_with_ganzhi):
-                continue
-            max_err_with_ganzhi = err
-        x1 = 'x' if meet_ganzhi else ' '
-        x2 = 'x' if meet_week else ' '
-        if not meet_ganzhi and i not in special_year:
-            continue
-        terr_year = str(datetime.timedelta(days=time_part_in_i_year))[:-7]
-        terr_month = str(datetime.timedelta(days=time_part_in_j_month))[:-7]
-        # print('{0:>5}年 {1:>7}月 {2:>5}閏 {3:>8}日 {4:>.6f}時 {7} [{5}], {6}'.format(i, j, leap, days, err, x, i % 128,
-        #                                                                         terr))
-        # min_err = err
+    """
+    列出合甲子的章 (年、月循環最後一日同日), 只留餘時創新高者 (超過 22 小時後全部列出), 及 special_year
+    各年數的循環資訊由 cycle_search.cycle_grid 一次算出, 只在這裡篩選
+    """
+    c = cycle_search.cycle_grid(ylen, mlen, max_year, special_years=special_year)[0]
+    special = np.isin(c['years'], special_year)
+    err = np.minimum(c['solar_time'], c['lunar_time'])
+    candidate = c['jiazi'] & (c['same_day'] | special)
+    # 與前一個合甲子候選者的最大餘時比較 (最多要求到 22 小時)
+    best_before = np.maximum.accumulate(np.concatenate([[0], np.where(candidate, err, 0)[:-1]]))
+    keep = np.where(candidate, err >= np.minimum(cycle_search.MIN_TIME_PART, best_before), special)
+    for row in c[keep]:
+        x1 = 'x' if row['jiazi'] else ' '
+        x2 = 'x' if row['week'] else ' '
+        terr_year = str(datetime.timedelta(days=float(row['solar_time'])))[:-7]
+        terr_month = str(datetime.timedelta(days=float(row['lunar_time'])))[:-7]
         print('{0:>5}年 {1:>7}月 {2:>8}日 {3:>08}時(年) {4:>08}時(月) [{5}] [{6}]'.
-              format(i, j, days + 1, terr_year, terr_month, x1, x2))
+              format(int(row['years']), int(row['months']), int(row['days']), terr_year, terr_month, x1, x2))
 
 
 if __name__ == '__main__':
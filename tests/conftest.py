@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+sys.path.insert(0, ROOT)
+
+import ephemerides  # noqa: E402
+import event_cache  # noqa: E402
+
+# 需要星曆表的測試以 KALENDARO_EPHEMERIS 指定 (如 de421.bsp, 涵蓋 1900 ~ 2050 年), 找不到檔案時略過。
+# 這些測試共用一個天象快取目錄; 要測快取本身的用 cache_dir, 另給一個空目錄。
+TEST_EPHEMERIS = os.environ.get('KALENDARO_EPHEMERIS', 'de421.bsp')
+
+
+@pytest.fixture(scope='session')
+def ephemeris(tmp_path_factory):
+    if not os.path.exists(TEST_EPHEMERIS):
+        pytest.skip('ephemeris not found: {}'.format(TEST_EPHEMERIS))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(event_cache, 'CACHE_DIR', str(tmp_path_factory.mktemp('cache')))
+        ephemerides.use(TEST_EPHEMERIS)
+        yield TEST_EPHEMERIS
+        ephemerides.use(None)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """ 空的天象快取目錄 """
+    path = str(tmp_path / 'cache')
+    monkeypatch.setattr(event_cache, 'CACHE_DIR', path)
+    return path
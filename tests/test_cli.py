@@ -0,0 +1,33 @@
+import argparse
+
+import pytest
+
+import kalendaro
+
+
+@pytest.mark.parametrize('text', ['2000-2-30', '1900-2-29', '2001-4-31', '1582-10-10', 'T2819-12-31', 'T2819-1-31', '2000-13-1'])
+def test_parse_jd_rejects_days_beyond_month(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        kalendaro.parse_jd(text)
+
+
+@pytest.mark.parametrize('text, jd', [
+    ('2000-2-29', 2451603.5),
+    ('1500-2-29', 2268991.5),  # 儒略曆閏年
+    ('1582-10-4', 2299159.5),
+    ('1582-10-15', 2299160.5),
+    ('T2820-12-31', 2444226.5),
+    ('-999', 1356173.5),
+])
+def test_parse_jd(text, jd):
+    assert kalendaro.parse_jd(text) == jd
+
+
+def test_negative_start_date(capsys):
+    kalendaro.main(['convert', '--start', '-999-1-1', '--', '-999-1-1'])
+    assert capsys.readouterr().out.splitlines()[1].startswith('1356174,')
+
+
+def test_cycle_search_rejects_common_options():
+    with pytest.raises(SystemExit):
+        kalendaro.main(['cycle-search', '--start', '1'])
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+import benchmark
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools')
+IMPORT_BUDGET_US = 20000  # 算術核心的 import 時間上限 (實測約 0.3 ms, 留足慢機器的餘裕)
+
+
+def _import_times(module):
+    """ python -X importtime: {模組: 累計 import 時間 (us)} """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)], cwd=TOOLS_DIR,
+                            check=True, capture_output=True, text=True).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_constants_import_time():
+    times = _import_times('constants')
+    assert times['constants'] < IMPORT_BUDGET_US
+    for module in benchmark.CORE_MODULES:
+        assert benchmark.third_party_imports(module) == []
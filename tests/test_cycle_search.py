@@ -0,0 +1,21 @@
+import numpy as np
+
+import constants
+import cycle_search
+
+SOLAR = [constants.tropical_year, 365.24219264]
+LUNAR = [constants.synodic_month, 29.5305888844]
+
+
+def test_chunk_size_does_not_change_results():
+    full = cycle_search.find_cycles(SOLAR, LUNAR, 5000, chunk_size=10 ** 8)
+    assert len(full)
+    for chunk_size in (7, 999, 5000, 12000):
+        assert np.array_equal(cycle_search.find_cycles(SOLAR, LUNAR, 5000, chunk_size=chunk_size), full)
+        grid = cycle_search.cycle_grid(SOLAR, LUNAR, 300, chunk_size=chunk_size)
+        assert np.array_equal(grid, cycle_search.cycle_grid(SOLAR, LUNAR, 300, chunk_size=10 ** 8))
+
+
+def test_known_cycles():
+    years = cycle_search.find_cycles(365.25, 29.530851, 100, min_level=cycle_search.ZHANG)['years'].tolist()
+    assert 19 in years and 76 in years
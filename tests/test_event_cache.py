@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+import ephemerides
+import event_cache
+from conftest import TEST_EPHEMERIS
+
+JD_1950 = 2433282.5
+
+
+def test_cache_miss_then_hit(ephemeris, cache_dir, monkeypatch):
+    e = event_cache.events(event_cache.SEASONS, JD_1950, JD_1950 + 3650, ephemeris)
+    assert len(e) == 40
+    assert len(os.listdir(cache_dir)) == 1
+
+    def no_compute(*args, **kwargs):
+        raise AssertionError('cache miss')
+
+    monkeypatch.setattr(event_cache, 'compute_events', no_compute)
+    again = event_cache.events(event_cache.SEASONS, JD_1950 + 365, JD_1950 + 730, ephemeris)
+    assert np.array_equal(again, e[4:8])
+
+
+def test_cache_keyed_by_ephemeris_file_name(ephemeris, cache_dir):
+    path = os.path.abspath(TEST_EPHEMERIS)
+    event_cache.events(event_cache.SEASONS, JD_1950, JD_1950 + 365, path)
+    files = os.listdir(cache_dir)
+    assert len(files) == 1 and files[0].startswith(os.path.basename(path) + '.')
+    assert event_cache._covering(path, event_cache.SEASONS, JD_1950, JD_1950 + 365)
+    assert event_cache._covering(ephemeris, event_cache.SEASONS, JD_1950, JD_1950 + 365)
+
+
+def test_cache_name_differs_for_same_file_name(tmp_path):
+    # 如 trim_ephemeris 精簡後的星曆表與原檔同名
+    full, trimmed = tmp_path / 'full' / 'de441_part-1.bsp', tmp_path / 'trimmed' / 'de441_part-1.bsp'
+    for path, size in [(full, 300), (trimmed, 100)]:
+        path.parent.mkdir()
+        path.write_bytes(b'\0' * size)
+    names = {event_cache._cache_name(str(full)), event_cache._cache_name(str(trimmed))}
+    assert len(names) == 2 and all(n.startswith('de441_part-1.bsp.') for n in names)
+
+
+def test_solar_term_solver_matches_find_discrete(ephemeris):
+    eph = ephemerides.get(ephemeris)
+    tt, code = event_cache._solve_solar_terms(eph, JD_1950, JD_1950 + 730)
+    expected_tt, expected_code = event_cache._find_discrete(eph, event_cache.SOLAR_TERMS, JD_1950, JD_1950 + 730)
+    assert len(tt) == 48
+    assert np.array_equal(code, expected_code)
+    assert np.abs(tt - expected_tt).max() * 86400 < .002  # 兩者各自收斂到 1 ms
+
+
+def test_solar_terms_split_matches_whole(ephemeris):
+    whole = event_cache.compute_events(event_cache.SOLAR_TERMS, JD_1950, JD_1950 + 3000, ephemeris)
+    parts = [event_cache.compute_events(event_cache.SOLAR_TERMS, a, b, ephemeris)
+             for a, b in [(JD_1950, JD_1950 + 1001.3), (JD_1950 + 1001.3, JD_1950 + 3000)]]
+    assert np.array_equal(np.concatenate(parts), whole)
+
+
+def test_outside_coverage(ephemeris, cache_dir):
+    jd0, _ = event_cache._coverage(ephemeris)
+    with pytest.raises(ValueError, match='outside ephemeris coverage'):
+        event_cache.events(event_cache.SEASONS, jd0 - 100000, jd0 - 99000, ephemeris)  # 如 kao 的西周年代
+    assert not os.path.exists(cache_dir) or os.listdir(cache_dir) == []
@@ -0,0 +1,18 @@
+import pytest
+
+import event_cache
+import ganzhi
+
+JD_2000 = 2451544.5
+
+
+def test_solar_month(ephemeris):
+    # 2000-02-04 立春 (TT 約 13:40), 前一日為丑月, 屬 1999 年
+    year, month = ganzhi.solar_month([JD_2000 + 33, JD_2000 + 35], 8 / 24, ephemeris)
+    assert year.tolist() == [1999, 2000] and month.tolist() == [11, 0]
+
+
+def test_jie_before_ephemeris_start(ephemeris):
+    jd0, _ = event_cache._coverage(ephemeris)
+    with pytest.raises(ValueError, match='out of ephemeris range'):
+        ganzhi.jie(jd0 + 5, jd0 + 10, ephemeris)
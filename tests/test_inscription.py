@@ -0,0 +1,35 @@
+import csv
+import os
+
+import numpy as np
+
+import event_cache
+import ganzhi
+import inscription
+
+KAO_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'jinhou_su_kao.csv')
+
+
+def _kao_csv():
+    """ jinhou_su_kao.csv (舊版 kao 的輸出): (月相, 分至) 事件陣列與比對結果的前三欄 """
+    with open(KAO_CSV, encoding='utf-8') as f:
+        rows = [r for r in csv.reader(f) if r][1:]
+    events = []
+    for prefix in ('M_', 'S_'):
+        selected = [r for r in rows if r[0].startswith(prefix)]
+        e = np.zeros(len(selected), dtype=event_cache.EVENT_DTYPE)
+        e['tt'] = [float(r[2]) for r in selected]
+        e['code'] = [int(r[0][2:]) for r in selected]
+        events.append(e)
+    matches = [','.join(r[:3]) for r in rows if r[0].endswith('月') and r[2].isdigit()]
+    return events[0], events[1], matches
+
+
+def test_jinhou_su_matches_checked_in_output():
+    moons, seasons, expected = _kao_csv()
+    months = inscription.build_months(moons, seasons)
+    matches = inscription.match(months, inscription.JINHOU_SU)
+    found = ['{}年{}月,{},{}'.format(year, m['start'] + 1, ganzhi.NAMES[m['ganzhi']], m['ganzhi'] + 1)
+             for year, m in zip(inscription.match_years(matches).tolist(), matches)]
+    assert len(expected) == 94
+    assert found == expected
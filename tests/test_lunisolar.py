@@ -0,0 +1,35 @@
+import numpy as np
+
+import constants
+import lunisolar
+
+JD_2001 = 2451910.5
+JD_2034 = 2463963.5
+# 2001 ~ 2033 年的閏月 (東經 120 度, 民用日), 月序以建寅計
+LEAP_MONTHS = [(2001, 4), (2004, 2), (2006, 7), (2009, 5), (2012, 4), (2014, 9), (2017, 6), (2020, 4), (2023, 2),
+               (2025, 6), (2028, 5), (2031, 3), (2033, 11)]
+
+
+def test_build_months_mean_motion():
+    # 平朔、平氣: 13 個月的歲恰有一個閏月, 閏月無中氣, 與前一月同月建
+    new_moons = np.arange(300) * constants.synodic_month + .3
+    zhongqi_tt = np.arange(-1, 300) * constants.tropical_year / 12 + 10
+    months = lunisolar.build_months(new_moons, zhongqi_tt, np.arange(-1, 300) % 12)
+    assert len(months) > 200
+    assert (months['zhongqi_count'][months['leap']] == 0).all()
+    sui_start = np.flatnonzero(months['branch'] == 0)
+    sui_start = sui_start[~months['leap'][sui_start]]
+    sizes = np.diff(sui_start)
+    leaps = np.add.reduceat(months['leap'].astype(int), sui_start)[:-1]
+    assert set(sizes) == {12, 13}
+    assert (leaps == (sizes == 13)).all()
+    assert (months['branch'][months['leap']] == months['branch'][np.flatnonzero(months['leap']) - 1]).all()
+
+
+def test_leap_months(ephemeris):
+    months = lunisolar.month_table(JD_2001, JD_2034, ephemeris, 8 / 24, ut=True)
+    leap = months[months['leap']]
+    years = [constants.jdn2gcal(int(zd) + constants.JDN_ZD0)[0] for zd in leap['start_zd']]
+    assert list(zip(years, leap['number'][:, lunisolar.JIANYIN].tolist())) == LEAP_MONTHS
+    assert (np.diff(months['start_zd']) == months['length'][:-1]).all()
+    assert lunisolar.month_names(leap[:1])[0] == '閏四月'
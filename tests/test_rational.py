@@ -0,0 +1,29 @@
+from fractions import Fraction
+
+import pytest
+
+import rational
+
+
+def _brute_force(x, max_denominator):
+    """ 逐一檢查每個分母, 第一類最佳逼近的定義 """
+    x = Fraction(x)
+    results, best = [], None
+    for q in range(1, max_denominator + 1):
+        p = round(x * q)
+        e = abs(x - Fraction(p, q))
+        if best is None or e < best:
+            results.append((p, q))
+            best = e
+    return results
+
+
+@pytest.mark.parametrize('x', [29.530589, 0.7, 365.2422, 0.2422, 2.0, Fraction(355, 113)])
+def test_best_approximations(x):
+    found = [(a.numerator, a.denominator) for a in rational.best_approximations(x, 2000)]
+    assert found == _brute_force(x, 2000)
+
+
+def test_first_convergent_is_tested():
+    assert [(a.numerator, a.denominator) for a in rational.best_approximations(29.530589, 2)] == [(30, 1), (59, 2)]
+    assert [(a.numerator, a.denominator) for a in rational.best_approximations(0.7, 3)] == [(1, 1), (1, 2), (2, 3)]
@@ -0,0 +1,39 @@
+import numpy as np
+from skyfield.api import load
+
+import event_cache
+import event_join
+import kalendaro
+import parallel
+import ziyu_day
+
+ts = load.timescale()
+
+
+def pairs_span(lo, hi, a, b, ephemeris):
+    """ 供 map_spans: [lo, hi) 間每個冬至與最近的朔 """
+    seasons = event_cache.events(event_cache.SEASONS, lo, hi, ephemeris, False)
+    moons = event_cache.events(event_cache.MOON_PHASES, a, b, ephemeris, False)
+    pairs = event_join.pair_solstices_new_moons(seasons, moons)
+    return [tuple(row) for row in pairs.tolist()]
+
+
+def test_search_without_hits(ephemeris):
+    # 1900 ~ 2050 年沒有朔旦冬至甲子: 分段後每一段都是空的, 整段與平行搜尋都傳回空串列
+    t0, t1 = ts.utc(1900, 1, 1), ts.utc(2050, 1, 1)
+    assert ziyu_day.find_new_moon_winter_solstice(t0, t1, jobs=1) == []
+    assert ziyu_day.find_new_moon_winter_solstice(t0, t1, jobs=3) == []
+    assert kalendaro.find_new_moon_winter_solstice_day(t0, t1, kalendaro.tz_cst, jobs=1) == []
+    assert kalendaro.find_new_moon_winter_solstice_day(t0, t1, kalendaro.tz_cst, jobs=3) == []
+    ziyu_day.find_3034(ts.utc(1902, 1, 1), ts.utc(1903, 1, 1))
+
+
+def test_parallel_spans_match_serial(ephemeris):
+    jd0, jd1 = ts.utc(1900, 1, 1).tt, ts.utc(2050, 1, 1).tt
+    event_cache.build(event_cache.SEASONS, jd0, jd1, ephemeris)
+    event_cache.build(event_cache.MOON_PHASES, jd0 - 16, jd1 + 16, ephemeris)
+    serial = parallel.merge(parallel.map_spans(pairs_span, jd0, jd1, 1, overlap=16, args=(ephemeris,)))
+    split = parallel.merge(parallel.map_spans(pairs_span, jd0, jd1, 3, overlap=16, args=(ephemeris,)))
+    assert len(serial) == 150
+    assert split == serial
+    assert np.abs(np.array([row[2] for row in serial])).max() < 15
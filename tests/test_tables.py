@@ -0,0 +1,68 @@
+import os
+
+import kalendaro
+import table_writer
+from conftest import ROOT
+
+
+def header(columns):
+    return ','.join(name for name, _ in columns)
+
+
+def test_table_schemas_match_checked_in_files():
+    for filename, columns in [('seasons_table.csv', kalendaro.SEASONS_TABLE_COLUMNS),
+                              ('jinhou_su.csv', kalendaro.EVENTS_TABLE_COLUMNS)]:
+        with open(os.path.join(ROOT, filename), encoding='utf-8') as f:
+            assert f.readline().rstrip('\r\n') == header(columns)
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n').split(',') for line in f]
+
+
+def test_csv_append_truncates_partial_line(tmp_path):
+    path = str(tmp_path / 'table.csv')
+    columns = [('a', 'i4'), ('b', 'f8')]
+    with table_writer.open_table(path, columns) as writer:
+        writer.write({'a': [1, 2], 'b': [.5, 1.5]})
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('3,2.')  # 中斷時寫到一半的列
+    assert table_writer.last_row(path, columns) == {'a': 2, 'b': 1.5}
+    with table_writer.open_table(path, columns, append=True) as writer:
+        writer.write({'a': [3], 'b': [2.5]})
+    assert read_rows(path) == [['a', 'b'], ['1', '0.5'], ['2', '1.5'], ['3', '2.5']]
+
+
+def test_bin_append_truncates_partial_row(tmp_path):
+    path = str(tmp_path / 'table')
+    columns = [('a', 'i4'), ('b', 'f8')]
+    with table_writer.open_table(path, columns, 'bin') as writer:
+        writer.write({'a': [1, 2], 'b': [.5, 1.5]})
+    with open(os.path.join(path, 'col00.bin'), 'ab') as f:
+        f.write(b'\x03\x00\x00\x00')  # 只寫了第一欄
+    assert table_writer.last_row(path, columns, 'bin') == {'a': 2, 'b': 1.5}
+    with table_writer.open_table(path, columns, 'bin', append=True) as writer:
+        writer.write({'a': [3], 'b': [2.5]})
+    table = table_writer.read_table(path)
+    assert table['a'].tolist() == [1, 2, 3] and table['b'].tolist() == [.5, 1.5, 2.5]
+
+
+def test_resume_checked_in_seasons_table(ephemeris, tmp_path):
+    # 由 repo 內的 seasons_table.csv (de422) 截到 1960 年之前, 再以測試的星曆表接續到 1970 年
+    rows = read_rows(os.path.join(ROOT, 'seasons_table.csv'))
+    head = [row for row in rows[1:] if int(row[4]) < 1960]
+    expected = [row for row in rows[1:] if 1960 <= int(row[4]) < 1970]
+    path = str(tmp_path / 'seasons_table.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(','.join(row) + '\n' for row in rows[:1] + head))
+        f.write('7,春分,0,24')  # 中斷時寫到一半的列
+    kalendaro.main(['seasons', '--resume', '-o', path, '--end', '1970'])
+    resumed = read_rows(path)
+    assert resumed[:len(head) + 1] == rows[:len(head) + 1]
+    added = resumed[len(head) + 1:]
+    assert len(added) == len(expected) == 40
+    for row, old in zip(added, expected):
+        same = [0, 1, 2, 4, 5, 6, 10, 12]  # 年序, 分至, Season, 年月日, 子輿紀, 年干支
+        assert [row[i] for i in same] == [old[i] for i in same]
+        assert abs(float(row[3]) - float(old[3])) < 1e-4  # 不同星曆表, JD 相差不到 10 秒
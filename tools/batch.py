@@ -0,0 +1,79 @@
+import numpy as np
+
+import constants
+
+# 共和曆 4/128 閏法: 每 4 年一閏, 每 128 年不閏 (第 128 年只有 365 日)
+# 以 共和1年1月1日 (ZD 800974) 為第 0 日
+
+
+def zd2tcal_batch(zd_array):
+    """ 子輿日轉共和曆 (陣列版)
+    與 zd2tcal 相同之 4/128 閏法與 divmod 算法, 結果逐項相同。
+    :param zd_array: 子輿日 (可為負數、可帶小數)
+    :return: (年, 月, 日, 時間小數) 四個陣列
+    """
+    zd = np.asarray(zd_array, dtype=np.float64)
+    days = np.floor(zd)
+    tt = zd - days
+    n = days.astype(np.int64) - constants.ZD_GHCal_0001_01_01
+    q128, r = np.divmod(n, constants.large_leap_cycle_days)
+    q4, r = np.divmod(r, constants.small_leap_cycle_days)
+    y4 = np.minimum(r // 365, 3)
+    diny = r - 365 * y4  # days in year, 0-based
+    m2, r = np.divmod(diny, 61)  # 兩個月(30+31日)為一組
+    big = r >= 30
+    yy = 1 + 128 * q128 + 4 * q4 + y4
+    mm = 2 * m2 + 1 + big
+    dd = np.where(big, r - 29, r + 1)
+    return yy, mm, dd, tt
+
+
+def tcal2zd_batch(y, m, d, t=0.0):
+    """ 共和曆轉子輿日 (陣列版)
+    同 tcal2zd_2 公式, 以整數運算代替浮點 floor。
+    :return: 子輿日陣列 (t 全為 0 時為整數陣列)
+    """
+    y = np.asarray(y, dtype=np.int64)
+    m = np.asarray(m, dtype=np.int64)
+    d = np.asarray(d, dtype=np.int64)
+    days = (y + 2191) * 1461 // 4 - (y + 2303) // 128 + (m - 1) * 61 // 2 + d + 363
+    if np.ndim(t) == 0 and t == 0:
+        return days
+    return days + np.asarray(t, dtype=np.float64)
+
+
+def jdn2gcal_batch(jdn):
+    """ 儒略日數轉格里曆 (陣列版, 逆推格里曆), 同 constants.jdn2gcal
+    :return: (年, 月, 日) 三個陣列
+    """
+    return constants.jdn2gcal(np.asarray(jdn, dtype=np.int64))
+
+
+def jdn2jcal_batch(jdn):
+    """ 儒略日數轉儒略曆 (陣列版), 同 constants.jdn2jcal
+    :return: (年, 月, 日) 三個陣列
+    """
+    return constants.jdn2jcal(np.asarray(jdn, dtype=np.int64))
+
+
+def jdn2cal_batch(jdn, gregorian_start=constants.GREGORIAN_START):
+    """ 儒略日數轉西曆 (陣列版): gregorian_start 之前為儒略曆, 之後為格里曆 """
+    jdn = np.asarray(jdn, dtype=np.int64)
+    gregorian = jdn >= gregorian_start
+    return tuple(np.where(gregorian, g, j) for g, j in zip(jdn2gcal_batch(jdn), jdn2jcal_batch(jdn)))
+
+
+def gcal2jdn_batch(y, m, d):
+    """ 格里曆轉儒略日數 (陣列版) """
+    return constants.gcal2jdn(*(np.asarray(v, dtype=np.int64) for v in (y, m, d)))
+
+
+def jcal2jdn_batch(y, m, d):
+    """ 儒略曆轉儒略日數 (陣列版) """
+    return constants.jcal2jdn(*(np.asarray(v, dtype=np.int64) for v in (y, m, d)))
+
+
+def cal2jdn_batch(y, m, d, gregorian_start=constants.GREGORIAN_START):
+    """ 西曆轉儒略日數 (陣列版) """
+    jdn = gcal2jdn_batch(y, m, d)
+    return np.where(jdn >= gregorian_start, jdn, jcal2jdn_batch(y, m, d))
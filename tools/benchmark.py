@@ -0,0 +1,276 @@
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import batch
+import constants
+import day_table
+import event_cache
+import gonghe_calendar
+
+# 基準測試
+# 每個工作負載以固定亂數種子產生輸入, 重複多輪整批計時求 ops/sec; 另逐次計時 (純量版每次一筆, 陣列版每次 LATENCY_BATCH 筆) 求單筆延遲的百分位數。
+#   python benchmark.py                       # 全部執行
+#   python benchmark.py --save base.json      # 存成基準
+#   python benchmark.py --compare base.json   # 與基準比較, 變慢超過門檻時 exit 1
+#   python benchmark.py python_startup import_constants   # 換算程序的啟動時間 (並檢查核心模組只用標準函式庫)
+
+SEED = 20221221
+REGRESSION_THRESHOLD = 0.10  # ops/sec 下降超過 10% 視為退步
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+CORE_MODULES = ['constants']  # 只依賴標準函式庫的算術核心
+
+ZD_RANGE = (constants.jdn2zd(constants.JDN_WANIAN_START), constants.jdn2zd(constants.JDN_WANIAN_END))
+
+LATENCY_BATCH = 100  # 陣列版工作負載量延遲時, 每次呼叫處理的筆數
+
+workloads = {}  # name: setup(size) -> (fn, ops, samples); samples: [(單次呼叫, 筆數), ...] 供量測延遲
+
+
+def workload(name):
+    def register(setup):
+        workloads[name] = setup
+        return setup
+
+    return register
+
+
+def _random_zds(size, fractional=True):
+    rng = random.Random(SEED)
+    if fractional:
+        return [rng.uniform(*ZD_RANGE) for _ in range(size)]
+    return [rng.randint(*ZD_RANGE) for _ in range(size)]
+
+
+def _scalar(fn, args_list):
+    def run():
+        for args in args_list:
+            fn(*args)
+
+    return run, len(args_list), [(functools.partial(fn, *args), 1) for args in args_list]
+
+
+def _batch(fn, *arrays):
+    """ 陣列版: 整批一次呼叫量吞吐量, 每 LATENCY_BATCH 筆一次呼叫量延遲 """
+    size = len(arrays[0])
+    samples = [(functools.partial(fn, *(a[i:i + LATENCY_BATCH] for a in arrays)), min(LATENCY_BATCH, size - i))
+               for i in range(0, size, LATENCY_BATCH)]
+    return (lambda: fn(*arrays)), size, samples
+
+
+@workload('zd2tcal')
+def _zd2tcal(size):
+    return _scalar(constants.zd2tcal, [(zd,) for zd in _random_zds(size)])
+
+
+@workload('zd2tcal_4')
+def _zd2tcal_4(size):
+    return _scalar(constants.zd2tcal_4, [(zd,) for zd in _random_zds(size)])
+
+
+@workload('tcal2zd_2')
+def _tcal2zd_2(size):
+    return _scalar(constants.tcal2zd_2, [constants.zd2tcal(zd) for zd in _random_zds(size)])
+
+
+@workload('zd2tcal_batch')
+def _zd2tcal_batch(size):
+    return _batch(batch.zd2tcal_batch, np.array(_random_zds(size)))
+
+
+@workload('tcal2zd_batch')
+def _tcal2zd_batch(size):
+    return _batch(batch.tcal2zd_batch, *batch.zd2tcal_batch(_random_zds(size)))
+
+
+@workload('ganzhi_of_jd')
+def _ganzhi_of_jd(size):
+    return _scalar(constants.ganzhi_of_jd, [(constants.zd2jd(zd),) for zd in _random_zds(size)])
+
+
+@workload('weekday_of_jd')
+def _weekday_of_jd(size):
+    return _scalar(constants.weekday_of_jd, [(constants.zd2jd(zd),) for zd in _random_zds(size)])
+
+
+@workload('jdn2cal')
+def _jdn2cal(size):
+    return _scalar(constants.jdn2cal, [(constants.JDN_ZD0 + zd,) for zd in _random_zds(size, False)])
+
+
+@workload('jdn2cal_batch')
+def _jdn2cal_batch(size):
+    return _batch(batch.jdn2cal_batch, np.array([constants.JDN_ZD0 + zd for zd in _random_zds(size, False)]))
+
+
+@workload('next_day')
+def _next_day(size):
+    return _scalar(gonghe_calendar.next_day, [constants.zd2tcal(zd)[:3] for zd in _random_zds(size, False)])
+
+
+@workload('to_row')
+def _to_row(size):
+    jdns = [constants.JDN_ZD0 + zd for zd in _random_zds(size, False)]
+    return _scalar(gonghe_calendar.to_row, [(jdn,) for jdn in jdns])
+
+
+@workload('event_cache.events')
+def _events(size):
+    ephemeris = gonghe_calendar.eph.name
+    ranges = event_cache._cached_ranges(ephemeris, event_cache.SEASONS)
+    if not ranges:
+        return None  # 沒有快取就略過, 不在基準測試中跑求根
+    r0, r1, _ = max(ranges, key=lambda r: r[1] - r[0])
+    rng = random.Random(SEED)
+    windows = []
+    for _ in range(max(size // 10, 1)):
+        jd0 = rng.uniform(r0, r1 - 400)
+        windows.append((event_cache.SEASONS, jd0, jd0 + 400, ephemeris))
+    return _scalar(event_cache.events, windows)
+
+
+@workload('day_table.day')
+def _day_table(size):
+    if not os.path.exists(day_table.DEFAULT_PATH):
+        return None  # 沒有逐日表就略過
+    jdns = [constants.JDN_ZD0 + zd for zd in _random_zds(size, False)]
+    return _scalar(day_table.day, [(jdn,) for jdn in jdns])
+
+
+def _run_python(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=TOOLS_DIR, check=True)
+
+
+@workload('python_startup')
+def _python_startup(size):
+    return _scalar(_run_python, [('pass',)] * max(size // 10000, 1))
+
+
+@workload('import_constants')
+def _import_constants(size):
+    # 新程序 import constants 並換算一日, 減去 python_startup 即為載入核心模組的時間
+    return _scalar(_run_python, [('import constants; constants.zd2tcal(0)',)] * max(size // 10000, 1))
+
+
+def third_party_imports(module):
+    """ 在新的程序中 import module, 傳回一併載入的非標準函式庫模組 (不含本目錄的模組) """
+    code = 'import sys; before = set(sys.modules); import {}; print(*{{m.split(".")[0] for m in set(sys.modules) - before}})'.format(module)
+    loaded = subprocess.run([sys.executable, '-c', code], cwd=TOOLS_DIR, check=True,
+                            capture_output=True, text=True).stdout.split()
+    local = {os.path.splitext(f)[0] for f in os.listdir(TOOLS_DIR)}
+    return [m for m in loaded if m not in sys.stdlib_module_names and m not in local]
+
+
+def measure(fn, ops, samples, rounds=10, warmup=1):
+    """
+    吞吐量: 每輪整批執行 fn, ops_per_sec 取各輪的中位數
+    延遲: samples 逐一計時 (純量版每次一筆, 陣列版每次 LATENCY_BATCH 筆, 取每筆的平均), p50/p90/p99 為這些單次量測的百分位數
+    """
+    for _ in range(warmup):
+        fn()
+    per_op = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        per_op.append((time.perf_counter() - start) / ops)
+    latency = np.empty(len(samples))
+    for i, (call, n) in enumerate(samples):
+        start = time.perf_counter()
+        call()
+        latency[i] = (time.perf_counter() - start) / n
+    return {
+        'ops': ops,
+        'rounds': rounds,
+        'ops_per_sec': float(1 / np.median(per_op)),
+        'latency_samples': len(samples),
+        'p50_us': float(np.percentile(latency, 50) * 1e6),
+        'p90_us': float(np.percentile(latency, 90) * 1e6),
+        'p99_us': float(np.percentile(latency, 99) * 1e6),
+    }
+
+
+def run(names=None, size=100000, rounds=10):
+    results = {}
+    for name in names or workloads:
+        setup = workloads[name](size)
+        if setup is None:
+            print('{:<20} skipped'.format(name), file=sys.stderr)
+            continue
+        results[name] = measure(*setup, rounds=rounds)
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """ 傳回退步的工作負載 [(名稱, 變化比例), ...] """
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        change = r['ops_per_sec'] / base['ops_per_sec'] - 1
+        r['change'] = change
+        if change < -threshold:
+            regressions.append((name, change))
+    return regressions
+
+
+def print_results(results):
+    print('{:<20} {:>14} {:>10} {:>10} {:>10} {:>8}'.format('workload', 'ops/sec', 'p50(us)', 'p90(us)', 'p99(us)', 'change'))
+    for name, r in results.items():
+        change = '{:+.1%}'.format(r['change']) if 'change' in r else ''
+        print('{:<20} {:>14,.0f} {:>10.3f} {:>10.3f} {:>10.3f} {:>8}'.format(
+            name, r['ops_per_sec'], r['p50_us'], r['p90_us'], r['p99_us'], change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='曆法轉換與天象查詢基準測試')
+    parser.add_argument('workloads', nargs='*', metavar='workload', help='預設全部: ' + ', '.join(workloads))
+    parser.add_argument('--size', type=int, default=100000, help='每輪的輸入筆數')
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--save', help='將結果存為基準 JSON')
+    parser.add_argument('--compare', help='與基準 JSON 比較')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+    unknown = set(args.workloads) - set(workloads)
+    if unknown:
+        parser.error('unknown workload: {}'.format(', '.join(sorted(unknown))))
+
+    results = run(args.workloads, args.size, args.rounds)
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'seed': SEED,
+                'size': args.size,
+                'results': results,
+            }, f, indent=2)
+    for name, change in regressions:
+        print('REGRESSION: {} {:+.1%}'.format(name, change), file=sys.stderr)
+    leaked = []
+    if 'import_constants' in results:
+        for module in CORE_MODULES:
+            leaked += ['{} imports {}'.format(module, m) for m in third_party_imports(module)]
+    for message in leaked:
+        print('NOT STDLIB-ONLY: {}'.format(message), file=sys.stderr)
+    return 1 if regressions or leaked else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
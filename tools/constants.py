@@ -1,9 +1,8 @@
 from math import floor, modf
 
-from pytz import timezone
-
-TZ_CST = timezone('Asia/Taipei')
-TZ_GMT = timezone('Europe/London')
+# 曆法算術核心: 子輿日、儒略日、共和曆、儒略曆、格里曆換算, 干支、星期、閏年規則
+# 只依賴標準函式庫, 讓短命的換算程序不必載入 numpy、skyfield、pytz (import 時間見 benchmark.py 的 import_constants)
+# 陣列版見 batch.py, 時區見 timezones.py
 
 # 《天文年鑑2017》太陽年，190頁，臺北市立天文科學教育館，2017年 (2019 年鑑亦是)
 tropical_year = 365.242190
@@ -27,6 +26,8 @@ JDN_GCal_0001_01_01 = 1721426
 JDN_JCal_0001_01_01 = 1721424
 JDN_GCal_1978_03_04 = 2443572
 
+GREGORIAN_START = 2299161  # JDN 1582/10/15, 此日起為格里曆 (同 skyfield.timelib.GREGORIAN_START)
+
 # JDN = floor(JD+.5)
 # JD  = ceil(JDN-.5) # 錯誤, 不能這樣反查
 
@@ -95,6 +96,13 @@ def weekday_of_jd(jd):
     return (int(floor(jd + .5)) + 1) % 7
 
 
+# 共和曆閏年: 每 4 年一閏 (12 月 31 日), 每 128 年不閏 (年為天文年號; 儒略曆、格里曆的閏年已含在下面的 JDN 換算式中)
+
+def is_tcal_leap_year(y):
+    # 以 & 連接, y 也可以是 numpy 整數陣列
+    return (y % 4 == 0) & (y % 128 != 0)
+
+
 # Converters
 
 def jd2zd(jd):
@@ -109,6 +117,45 @@ def jdn2zd(jd):
     return jd - JDN_ZD0
 
 
+# 儒略曆, 格里曆 (逆推), 年為天文年號 (西元前 1 年為 0 年)
+# 以 floor 除法計算, 負數 JDN 亦正確; y, m, d 與 jdn 也可以是 numpy 整數陣列 (見 batch.py)
+
+def jdn2jcal(jdn):
+    # Richards 演算法
+    e = 4 * (jdn + 1401) + 3
+    h = 5 * ((e % 1461) // 4) + 2
+    d = (h % 153) // 5 + 1
+    m = (h // 153 + 2) % 12 + 1
+    return e // 1461 - 4716 + (14 - m) // 12, m, d
+
+
+def jdn2gcal(jdn):
+    # 加上兩曆的日差後, 以儒略曆算法求格里曆日期
+    return jdn2jcal(jdn + (4 * jdn + 274277) // 146097 * 3 // 4 - 38)
+
+
+def jcal2jdn(y, m, d):
+    a = (14 - m) // 12
+    y, m = y + 4800 - a, m + 12 * a - 3
+    return d + (153 * m + 2) // 5 + 365 * y + y // 4 - 32083
+
+
+def gcal2jdn(y, m, d):
+    a = (14 - m) // 12
+    y, m = y + 4800 - a, m + 12 * a - 3
+    return d + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+
+
+def jdn2cal(jdn, gregorian_start=GREGORIAN_START):
+    """ 西曆: gregorian_start 之前為儒略曆, 之後為格里曆 """
+    return jdn2gcal(jdn) if jdn >= gregorian_start else jdn2jcal(jdn)
+
+
+def cal2jdn(y, m, d, gregorian_start=GREGORIAN_START):
+    jdn = gcal2jdn(y, m, d)
+    return jdn if jdn >= gregorian_start else jcal2jdn(y, m, d)
+
+
 def jd2zd_parted(jd):
     zd = jd - JD_ZD0
     p, d = int(zd // cycle_days), zd % cycle_days
@@ -135,6 +182,29 @@ def tcal2zd_2(y, m, d, t=0):
     return days + t
 
 
+def zd2tcal(zd):
+    """ 子輿日轉共和曆 (預設方法)
+    以 divmod 直接求 128 年、4 年、年內、月內之位置，不需迴圈，耗時不隨年代遠近改變。
+    小數部分先行分離，月末日帶小數時不會出現 zd2tcal_4 的「0日」問題。
+    zd2tcal_1 ~ zd2tcal_4 僅保留作為驗證用的參考實作。
+    """
+    days = floor(zd)
+    tt = float(zd - days)
+    q128, r = divmod(days - ZD_GHCal_0001_01_01, large_leap_cycle_days)
+    q4, r = divmod(r, small_leap_cycle_days)
+    y4 = min(r // 365, 3)  # 第 128 年的最後一組 4 年只有 1460 日，不會到 4
+    diny = r - 365 * y4  # days in year, 0-based
+    m2, r = divmod(diny, 61)  # 兩個月(30+31日)為一組
+    if r < 30:
+        mm, dd = 2 * m2 + 1, r + 1
+    else:
+        mm, dd = 2 * m2 + 2, r - 29
+    yy = 1 + 128 * q128 + 4 * q4 + y4
+    return yy, mm, dd, tt
+
+
+# 以下 zd2tcal_1 ~ zd2tcal_4 為舊方法，僅作為 zd2tcal 的驗證參考
+
 def zd2tcal_1(zd):  # method 1
     num_padding_cycle = 0
     ed = zd - (ZD_GHCal_0001_01_01 - 1)  # ed = (p * period_days + d) - (gh_y1_zd - 1)
@@ -241,26 +311,19 @@ def zd2tcal_4(zd):  # method 4, base on method 2
 
 def find_fraction(num_float, min_denominator, max_denominator):
     """
-    尋找分數表示式
+    尋找分數表示式 (漸近分數, 見 rational.py)
     :param num_float: 實際數值
     :param min_denominator: 最小分母
     :param max_denominator: 最大分母
-    :return:
+    :return: [rational.Approximation, ...]
     """
-    results = [(1, 1, num_float)]  # (分子, 分母, [誤差*分母])
-    for denominator in range(min_denominator, max_denominator):
-        top = num_float * denominator
-        left_int = floor(top)
-        right_int = left_int + 1
-        left_delta, right_delta = top - left_int, right_int - top
-        numerator, delta = (left_int, left_delta) if left_delta < right_delta else (right_int, right_delta)
-        if delta < results[-1][2]:
-            results.append((int(numerator), int(denominator), delta))
+    import rational  # rational 需要 numpy, 只在這裡載入
+
+    results = [a for a in rational.convergents(num_float, max_denominator - 1)
+               if a.denominator >= min_denominator and a.numerator != 0]
     print('target: {} ({} - {})'.format(num_float, min_denominator, max_denominator))
-    for r in results:
-        if r[0] == 0:
-            continue
-        v = r[0] / r[1]
-        d = v - num_float
-        op = '+' if d > 0 else '-'
-        print('{0:>4d} /{1:>4d} | value: {2:.9f}, delta: {4:} {3:0.9f}'.format(r[0], r[1], v, abs(d), op))
+    for a in results:
+        op = '+' if a.error > 0 else '-'
+        print('{0:>4d} /{1:>4d} | value: {2:.9f}, delta: {4:} {3:0.9f}'.format(
+            a.numerator, a.denominator, a.value, abs(a.error), op))
+    return results
@@ -0,0 +1,113 @@
+import numpy as np
+
+import constants
+
+# 章蔀紀週期搜尋 (向量化)
+# 一次計算所有年數, 且可同時比較多組 (回歸年, 朔望月) 常數。
+#   章: 年循環與月循環的最後一日為同一天
+#   蔀: 章, 且兩者最後一日的餘時都已超過 22 小時 (幾乎回到同一時刻)
+#   紀: 蔀, 且總日數合甲子
+
+ZHANG, BU, JI = 1, 2, 3
+MIN_TIME_PART = 0.916667  # 22 小時之後
+SPECIAL_YEARS = [19, 76, 391, 1520, 1539, 4560]  # 1章19歲, 1蔀76歲, 391年144閏(大明曆), 1紀1520歲, 1統1539年, 1元4560歲
+
+CYCLE_DTYPE = np.dtype([
+    ('grid', 'i4'),  # (solar_len, lunar_len) 組合的序號
+    ('solar_len', 'f8'),
+    ('lunar_len', 'f8'),
+    ('years', 'i4'),  # 回歸年數
+    ('months', 'i8'),  # 朔望月數
+    ('days', 'i8'),  # 太陽日數 (含最後一日)
+    ('solar_days', 'f8'),  # 年循環太陽日數
+    ('lunar_days', 'f8'),  # 月循環太陽日數
+    ('solar_time', 'f8'),  # 年循環最後一日餘時 (日)
+    ('lunar_time', 'f8'),  # 月循環最後一日餘時 (日)
+    ('residual', 'f8'),  # 年循環 - 月循環 (日)
+    ('same_day', '?'),
+    ('record', '?'),  # 餘時為目前為止最大者
+    ('jiazi', '?'),  # 合甲子
+    ('week', '?'),  # 合七曜
+    ('level', 'i1'),  # 0, ZHANG, BU, JI
+])
+
+
+def _cycle_chunks(solar_lens, lunar_lens, max_year, special_years=SPECIAL_YEARS, chunk_size=4000000):
+    """
+    逐塊計算循環資訊, 每塊至多約 chunk_size 格 (組合 × 年數), 記憶體用量只跟 chunk_size 有關
+    年數太多時一組常數也分成多塊, 餘時紀錄 (record) 的目前最大值跨塊延續
+    :return: 產生 (組合 slice, 年數 slice, CYCLE_DTYPE 二維陣列)
+    """
+    solar, lunar = np.meshgrid(np.atleast_1d(solar_lens), np.atleast_1d(lunar_lens), indexing='ij')
+    solar, lunar = solar.ravel(), lunar.ravel()
+    years_all = np.arange(1, max_year, dtype=np.int64)
+    cols = min(max(chunk_size, 1), max(len(years_all), 1))
+    rows = max(chunk_size // cols, 1)
+    for g0 in range(0, len(solar), rows):
+        g = slice(g0, g0 + rows)
+        s, m = solar[g, None], lunar[g, None]
+        best = np.full((len(s), 1), .5)  # 目前為止最大的餘時
+        for y0 in range(0, len(years_all), cols):
+            y = slice(y0, y0 + cols)
+            years = years_all[y]
+            t = np.zeros((len(s), len(years)), dtype=CYCLE_DTYPE)
+            solar_days = years * s
+            months = np.rint(solar_days / m)
+            lunar_days = months * m
+            solar_day_part, lunar_day_part = np.floor(solar_days), np.floor(lunar_days)
+            t['grid'] = np.arange(g0, g0 + len(s))[:, None]
+            t['solar_len'], t['lunar_len'], t['years'] = s, m, years
+            t['months'] = months
+            t['days'] = solar_day_part + 1
+            t['solar_days'], t['lunar_days'] = solar_days, lunar_days
+            t['solar_time'], t['lunar_time'] = solar_days - solar_day_part, lunar_days - lunar_day_part
+            t['residual'] = solar_days - lunar_days
+            t['same_day'] = solar_day_part == lunar_day_part
+            time_part = np.where(t['same_day'], np.minimum(t['solar_time'], t['lunar_time']), 0)
+            tracked = np.where(np.isin(years, special_years), 0, time_part)
+            best_before = np.maximum.accumulate(np.concatenate([best, tracked[:, :-1]], axis=1), axis=1)
+            best = np.maximum(best_before[:, -1:], tracked[:, -1:])
+            t['record'] = tracked > best_before
+            t['jiazi'] = t['days'] % 60 == 0
+            t['week'] = t['days'] % 7 == 0
+            bu = t['same_day'] & (time_part >= MIN_TIME_PART)
+            t['level'] = np.where(bu & t['jiazi'], JI, np.where(bu, BU, np.where(t['same_day'], ZHANG, 0)))
+            yield g, y, t
+
+
+def cycle_grid(solar_lens, lunar_lens, max_year, special_years=SPECIAL_YEARS, chunk_size=4000000):
+    """
+    計算每組常數、每個年數 1..max_year-1 的循環資訊 (整個表格留在記憶體, 每格約 90 bytes; 只要候選週期請用 find_cycles)
+    :param solar_lens: 回歸年長度 (陣列或單一值)
+    :param lunar_lens: 朔望月長度 (陣列或單一值)
+    :param special_years: 這些年數不參與餘時紀錄 (record) 的比較
+    :return: CYCLE_DTYPE 陣列, 形狀 (組合數, max_year - 1), 組合為 solar_lens × lunar_lens
+    """
+    table = np.zeros((np.size(solar_lens) * np.size(lunar_lens), max(max_year - 1, 0)), dtype=CYCLE_DTYPE)
+    for g, y, t in _cycle_chunks(solar_lens, lunar_lens, max_year, special_years, chunk_size):
+        table[g, y] = t
+    return table
+
+
+def find_cycles(solar_lens, lunar_lens, max_year, min_level=BU, special_years=SPECIAL_YEARS, chunk_size=4000000):
+    """
+    傳回候選週期 (一維 CYCLE_DTYPE 陣列, 依組合、年數排序), 逐塊篩選, 不保留整個表格
+    保留: level >= min_level, 或餘時創新高的同日循環, 或 special_years 中的年數
+    """
+    found = [np.zeros(0, dtype=CYCLE_DTYPE)]
+    for _, _, t in _cycle_chunks(solar_lens, lunar_lens, max_year, special_years, chunk_size):
+        keep = (t['level'] >= min_level) | (t['same_day'] & t['record']) | np.isin(t['years'], special_years)
+        found.append(t[keep])
+    cycles = np.concatenate(found)
+    return cycles[np.lexsort((cycles['years'], cycles['grid']))]
+
+
+if __name__ == "__main__":
+    # 比較兩組常數: 天文年鑑 vs Jacobs
+    tropical_year_jacobs = 365.24219264
+    synodic_month_jacobs = 29.5305888844
+    cycles = find_cycles([constants.tropical_year, tropical_year_jacobs],
+                         [constants.synodic_month, synodic_month_jacobs], 20000, min_level=JI)
+    for c in cycles[cycles['level'] == JI]:
+        print('{:.8f} {:.10f} {:>6}年 {:>7}月 {:>8}日 residual {:+.6f}'.format(
+            c['solar_len'], c['lunar_len'], c['years'], c['months'], c['days'], c['residual']))
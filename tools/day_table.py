@@ -0,0 +1,89 @@
+import os
+import sys
+
+import numpy as np
+
+import batch
+import constants
+import event_cache
+
+# 萬年曆逐日查表
+# JDN_WANIAN_START..JDN_WANIAN_END 每日一筆定長紀錄 (14 bytes, 約 46 MB), 存成 .npy 以 memory-map 讀取,
+# 查詢只是以 JDN 為索引取值, 不需任何換算。
+#   python day_table.py [path]    # 建表
+
+DAY_DTYPE = np.dtype([
+    ('tcal_y', '<i2'), ('tcal_m', 'i1'), ('tcal_d', 'i1'),  # 共和曆
+    ('gcal_y', '<i2'), ('gcal_m', 'i1'), ('gcal_d', 'i1'),  # 格里曆 (逆推)
+    ('jcal_y', '<i2'), ('jcal_m', 'i1'), ('jcal_d', 'i1'),  # 儒略曆
+    ('ganzhi', 'i1'),  # 日干支, 0 = 甲子
+    ('weekday', 'i1'),  # 0 = Sun
+])
+
+JDN_START = constants.JDN_WANIAN_START
+JDN_END = constants.JDN_WANIAN_END  # 含
+DEFAULT_PATH = os.path.join(event_cache.CACHE_DIR, 'days.{}_{}.npy'.format(JDN_START, JDN_END))
+CHUNK_DAYS = 1 << 20
+
+_opened = {}  # path: memory-mapped array
+
+
+def compute(jdn0, jdn1):
+    """ [jdn0, jdn1) 的逐日紀錄 """
+    jdn = np.arange(jdn0, jdn1, dtype=np.int64)
+    days = np.zeros(len(jdn), dtype=DAY_DTYPE)
+    days['tcal_y'], days['tcal_m'], days['tcal_d'], _ = batch.zd2tcal_batch(jdn - constants.JDN_ZD0)
+    days['gcal_y'], days['gcal_m'], days['gcal_d'] = batch.jdn2gcal_batch(jdn)
+    days['jcal_y'], days['jcal_m'], days['jcal_d'] = batch.jdn2jcal_batch(jdn)
+    days['ganzhi'] = (jdn - 11) % 60
+    days['weekday'] = (jdn + 1) % 7
+    return days
+
+
+def build(path=DEFAULT_PATH):
+    """ 建立整個萬年曆範圍的表, 先寫暫存檔再改名 """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    table = np.lib.format.open_memmap(tmp, mode='w+', dtype=DAY_DTYPE, shape=(JDN_END + 1 - JDN_START,))
+    for jdn0 in range(JDN_START, JDN_END + 1, CHUNK_DAYS):
+        jdn1 = min(jdn0 + CHUNK_DAYS, JDN_END + 1)
+        table[jdn0 - JDN_START:jdn1 - JDN_START] = compute(jdn0, jdn1)
+    table.flush()
+    del table
+    os.replace(tmp, path)
+    _opened.pop(path, None)
+    return path
+
+
+def load(path=DEFAULT_PATH):
+    """ 以 memory-map 開啟逐日表, 還沒建立時先建表 """
+    if path not in _opened:
+        if not os.path.exists(path):
+            build(path)
+        _opened[path] = np.load(path, mmap_mode='r')
+    return _opened[path]
+
+
+def day(jdn, path=DEFAULT_PATH):
+    """
+    查詢某日 (JDN 可為陣列)
+    :return: DAY_DTYPE 紀錄
+    """
+    i = np.asarray(jdn) - JDN_START
+    if np.any((i < 0) | (i > JDN_END - JDN_START)):
+        raise ValueError('JDN out of range: {} - {}'.format(JDN_START, JDN_END))
+    return load(path)[i]
+
+
+def days(jdn0, jdn1, path=DEFAULT_PATH):
+    """
+    查詢 [jdn0, jdn1) 的逐日紀錄
+    :return: DAY_DTYPE 結構陣列 (memory-mapped, 唯讀)
+    """
+    if jdn0 < JDN_START or jdn1 > JDN_END + 1:
+        raise ValueError('JDN out of range: {} - {}'.format(JDN_START, JDN_END))
+    return load(path)[jdn0 - JDN_START:jdn1 - JDN_START]
+
+
+if __name__ == "__main__":
+    print(build(*sys.argv[1:2]))
@@ -0,0 +1,70 @@
+import os
+
+from skyfield.api import load
+
+# Ephemeris: 曆書, 星曆表。
+# ref.: https://rhodesmill.org/skyfield/planets.html
+# "de422.bsp"  # Issued in 2008, -3000 to 3000, 623 MB
+# "de441.bsp"  # Issued in 2020, -13200 to 17191, 3.1 GB
+# "de441_part-1.bsp"  # Issued in 2020, -13200 to 17191, 3.1 GB
+# "kalendaro.bsp"  # Issued in 2020, -5000 to 3000, based on de441.bsp (只含日、地、月, 以 trim_ephemeris.py 產生)
+#
+# 星曆表檔案動輒數百 MB 至數 GB, 只在第一次天文計算時才開啟, 且同一程序內共用。
+# 可用環境變數 KALENDARO_EPHEMERIS 或 use() 指定, 會覆蓋各模組自己的預設值。
+
+DEFAULT_EPHEMERIS = 'de422.bsp'
+
+_selected = os.environ.get('KALENDARO_EPHEMERIS')
+_kernels = {}  # name: SpiceKernel
+
+
+def use(name):
+    """ 指定本程序使用的星曆表 (None 表示回到各模組預設值) """
+    global _selected
+    _selected = name
+
+
+def resolve(default=DEFAULT_EPHEMERIS):
+    """ 實際使用的星曆表名稱 """
+    return _selected or default
+
+
+def get(name=None):
+    """ 取得 (必要時開啟) 星曆表 """
+    name = name or resolve()
+    if name not in _kernels:
+        _kernels[name] = load(name)
+    return _kernels[name]
+
+
+def is_loaded(name=None):
+    return (name or resolve()) in _kernels
+
+
+class LazyEphemeris(object):
+    """
+    延遲開啟的星曆表, 可直接當作 SpiceKernel 使用 (如 almanac.seasons(eph), eph['earth'])
+    """
+
+    def __init__(self, default=DEFAULT_EPHEMERIS):
+        self.default = default
+
+    @property
+    def name(self):
+        return resolve(self.default)
+
+    @property
+    def kernel(self):
+        return get(self.name)
+
+    def __getitem__(self, target):
+        return self.kernel[target]
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or attr == 'default':  # pickle/copy 時不要開啟星曆表
+            raise AttributeError(attr)
+        return getattr(self.kernel, attr)
+
+    def __repr__(self):
+        state = 'loaded' if is_loaded(self.name) else 'not loaded'
+        return '<LazyEphemeris {} ({})>'.format(self.name, state)
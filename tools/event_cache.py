@@ -0,0 +1,255 @@
+import hashlib
+import os
+import re
+import sys
+
+import numpy as np
+from skyfield import almanac
+from skyfield.api import load
+from skyfield.framelib import ecliptic_frame
+
+import ephemerides
+import parallel
+
+# 天象事件快取
+# 以 almanac.find_discrete 逐段求出某一星曆表的所有分至、月相事件 (節氣另以向量化的牛頓法求根)，存成可 memory-map 的 .npy 檔。
+# 檔名: {星曆表檔名}.{路徑雜湊}.{事件種類}.{起始JD}_{結束JD}.npy, 例: de422.bsp.3f2a91c0.seasons.625000_2817000.npy
+# 路徑雜湊取自星曆表的實際路徑與檔案大小, 不同目錄下同名的星曆表 (如精簡後的 de441_part-1.bsp 與原檔) 不共用快取。
+# 之後的查詢直接以二分搜尋切出所需範圍，不再重跑求根。
+
+SEASONS = 'seasons'  # 0 春分, 1 夏至, 2 秋分, 3 冬至
+MOON_PHASES = 'moon_phases'  # 0 朔, 1 上弦, 2 望, 3 下弦
+SOLAR_TERMS = 'solar_terms'  # 太陽視黃經每 15 度, 0 春分, 1 清明, ..., 18 冬至, 21 立春; 偶數為中氣, 奇數為節
+
+EVENT_DTYPE = np.dtype([('tt', '<f8'), ('code', 'i1')])
+
+CACHE_DIR = os.environ.get('KALENDARO_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'kalendaro'))
+CHUNK_DAYS = 36525  # 每次求根的區間 (一百年); 快取範圍亦以此為單位對齊
+SOLAR_TERM_STEP = 5  # 節氣求根的取樣間隔 (日), 太陽每日約行 1 度, 須遠小於 15 日
+SOLAR_TERM_EPSILON = .001 / 86400  # 牛頓迭代的收斂門檻 (日), 同 find_discrete 的預設值 (1 ms)
+SOLAR_TERM_ITERATIONS = 10
+
+ts = load.timescale()
+_opened = {}  # path: memory-mapped array
+
+
+def solar_terms(eph):
+    """ 同 almanac.seasons, 但分為 24 個節氣 (供 find_discrete; 快取以 _solve_solar_terms 計算) """
+    earth, sun = eph['earth'], eph['sun']
+
+    def solar_term_at(t):
+        _, lon, _ = earth.at(t).observe(sun).apparent().frame_latlon(ecliptic_frame)
+        return (lon.degrees // 15).astype(int)
+
+    solar_term_at.step_days = 7
+    return solar_term_at
+
+
+def _solve_solar_terms(eph, jd0, jd1):
+    """
+    [jd0, jd1) 間的節氣, 整段一次求根:
+    先以 SOLAR_TERM_STEP 取樣太陽視黃經, 找出跨過 15 度倍數的區間, 線性內插為初值,
+    再以區間的平均速率對全部節氣同時做牛頓迭代, 各自收斂到 SOLAR_TERM_EPSILON 為止。
+    取樣點對齊 SOLAR_TERM_STEP 的倍數 (不隨 jd0 移動), 分段或平行計算的結果與整段計算完全相同。
+    :return: (時刻陣列, 事件碼陣列)
+    """
+    earth, sun = eph['earth'], eph['sun']
+
+    def longitude(tt):
+        _, lon, _ = earth.at(ts.tt_jd(tt)).observe(sun).apparent().frame_latlon(ecliptic_frame)
+        return lon.degrees
+
+    grid = np.arange(np.floor(jd0 / SOLAR_TERM_STEP), np.ceil(jd1 / SOLAR_TERM_STEP) + 1) * SOLAR_TERM_STEP
+    grid = np.unique(np.clip(grid, *_segment_range(eph)))
+    lon = longitude(grid)
+    term = np.floor(lon / 15)
+    i = np.flatnonzero(term[1:] != term[:-1])  # 每個取樣區間至多一個節氣
+    target = term[i + 1] * 15
+    rate = (lon[i + 1] - lon[i]) % 360 / (grid[i + 1] - grid[i])
+    tt = grid[i] + (target - lon[i]) % 360 / rate
+    active = np.ones(len(tt), dtype=bool)
+    for _ in range(SOLAR_TERM_ITERATIONS):
+        k = np.flatnonzero(active)
+        if len(k) == 0:
+            break
+        step = ((target[k] - longitude(tt[k]) + 180) % 360 - 180) / rate[k]
+        tt[k] += step
+        active[k] = np.abs(step) >= SOLAR_TERM_EPSILON
+    code = (term[i + 1] % 24).astype(np.int8)
+    keep = (tt >= jd0) & (tt < jd1)
+    return tt[keep], code[keep]
+
+
+def _find_discrete(eph, kind, jd0, jd1):
+    t, y = almanac.find_discrete(ts.tt_jd(jd0), ts.tt_jd(jd1), _event_functions[kind](eph))
+    return t.tt, y
+
+
+_event_functions = {
+    SEASONS: almanac.seasons,
+    MOON_PHASES: almanac.moon_phases,
+    SOLAR_TERMS: solar_terms,
+}
+_event_solvers = {
+    SOLAR_TERMS: _solve_solar_terms,
+}
+
+
+def _segment_range(eph):
+    """ 星曆表各 segment 共同涵蓋的 JD 範圍, 內縮一日 (視位置要往前推光行時) """
+    jd0 = max(s.spk_segment.start_jd for s in eph.segments) + 1
+    jd1 = min(s.spk_segment.end_jd for s in eph.segments) - 1
+    return jd0, jd1
+
+
+def _coverage(ephemeris):
+    """ 星曆表各 segment 共同涵蓋的 JD 範圍 (內縮一日, 取整數) """
+    jd0, jd1 = _segment_range(ephemerides.get(ephemeris))
+    return int(np.ceil(jd0)), int(np.floor(jd1))
+
+
+def _cache_name(ephemeris):
+    """
+    快取檔名中的星曆表名稱: 檔名 (星曆表以路徑指定時亦然, 快取一律放在 CACHE_DIR) 加上實際路徑與檔案大小的雜湊
+    檔案尚未下載時大小以 0 計, 下載後換成新的名稱, 最多多算一次
+    """
+    path = os.path.realpath(os.path.join(load.directory, ephemeris))
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    digest = hashlib.sha1('{}:{}'.format(path, size).encode('utf-8')).hexdigest()[:8]
+    return '{}.{}'.format(os.path.basename(ephemeris), digest)
+
+
+def _cache_path(ephemeris, kind, jd0, jd1):
+    return os.path.join(CACHE_DIR, '{}.{}.{}_{}.npy'.format(_cache_name(ephemeris), kind, jd0, jd1))
+
+
+def _cached_ranges(ephemeris, kind):
+    """ 列出已快取的範圍 [(jd0, jd1, path), ...] """
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    pattern = re.compile(r'^{}\.{}\.(-?\d+)_(-?\d+)\.npy$'.format(re.escape(_cache_name(ephemeris)), kind))
+    ranges = []
+    for filename in os.listdir(CACHE_DIR):
+        m = pattern.match(filename)
+        if m:
+            ranges.append((int(m.group(1)), int(m.group(2)), os.path.join(CACHE_DIR, filename)))
+    ranges.sort()
+    return ranges
+
+
+def _open(path):
+    if path not in _opened:
+        _opened[path] = np.load(path, mmap_mode='r')
+    return _opened[path]
+
+
+def _covering(ephemeris, kind, jd0, jd1):
+    for r0, r1, path in _cached_ranges(ephemeris, kind):
+        if r0 <= jd0 and jd1 <= r1:
+            return path
+    return None
+
+
+def _compute_span(lo, hi, a, b, kind, ephemeris):
+    return compute_events(kind, lo, hi, ephemeris)
+
+
+def compute_events(kind, jd0, jd1, ephemeris, jobs=1):
+    """
+    直接求 [jd0, jd1) 間的事件 (不經快取): 節氣以 _solve_solar_terms, 其餘以 find_discrete
+    :param jobs: 大於 1 時以 process pool 分段平行求根
+    :return: EVENT_DTYPE 結構陣列, 依時間排序
+    """
+    if jobs != 1 and jd1 - jd0 > CHUNK_DAYS:
+        chunks = parallel.map_spans(_compute_span, jd0, jd1, jobs, args=(kind, ephemeris), chunks_per_job=1)
+        return np.concatenate(chunks)
+    eph = ephemerides.get(ephemeris)
+    solve = _event_solvers.get(kind)
+    chunks = [np.empty(0, dtype=EVENT_DTYPE)]
+    a = jd0
+    while a < jd1:
+        b = min(a + CHUNK_DAYS, jd1)
+        tt, y = solve(eph, a, b) if solve else _find_discrete(eph, kind, a, b)
+        chunk = np.empty(len(y), dtype=EVENT_DTYPE)
+        chunk['tt'], chunk['code'] = tt, y
+        chunks.append(chunk[chunk['tt'] < b])
+        a = b
+    return np.concatenate(chunks)
+
+
+def build(kind, jd0, jd1, ephemeris, jobs=1):
+    """
+    建立 (或擴充) 涵蓋 [jd0, jd1) 的快取檔, 與之重疊或相鄰的舊快取會合併, 只計算缺少的部分
+    超出星曆表範圍的部分截去; 完全在範圍之外時 ValueError
+    :return: 快取檔路徑
+    """
+    cov0, cov1 = _coverage(ephemeris)
+    if jd0 >= cov1 or jd1 <= cov0:
+        raise ValueError('JD {}..{} outside ephemeris coverage ({}..{}): {}'.format(jd0, jd1, cov0, cov1, ephemeris))
+    jd0 = max(int(np.floor(jd0 / CHUNK_DAYS)) * CHUNK_DAYS, cov0)
+    jd1 = min(int(np.ceil(jd1 / CHUNK_DAYS)) * CHUNK_DAYS, cov1)
+    path = _covering(ephemeris, kind, jd0, jd1)
+    if path is not None:  # 超出星曆表範圍的請求, 截斷後可能已有快取
+        return path
+    merged = [r for r in _cached_ranges(ephemeris, kind) if r[0] <= jd1 and r[1] >= jd0]
+    if merged:
+        jd0, jd1 = min(jd0, merged[0][0]), max(jd1, max(r[1] for r in merged))
+    parts, cursor = [], jd0
+    for r0, r1, path in merged:
+        if cursor < r0:
+            parts.append(compute_events(kind, cursor, r0, ephemeris, jobs))
+        cached = np.load(path)
+        parts.append(cached[cached['tt'] >= cursor])
+        cursor = max(cursor, r1)
+    if cursor < jd1:
+        parts.append(compute_events(kind, cursor, jd1, ephemeris, jobs))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(ephemeris, kind, jd0, jd1)
+    tmp_path = '{}.{}.tmp.npy'.format(path, os.getpid())
+    np.save(tmp_path, np.concatenate(parts))
+    os.replace(tmp_path, path)
+    for _, _, old_path in merged:
+        _opened.pop(old_path, None)
+        if old_path != path:
+            os.remove(old_path)
+    return path
+
+
+def build_all(ephemeris, jobs=1):
+    """ 預先計算星曆表全部時間範圍內的分至、月相與節氣 """
+    jd0, jd1 = _coverage(ephemeris)
+    for kind in _event_functions:
+        build(kind, jd0, jd1, ephemeris, jobs)
+
+
+def events(kind, jd0, jd1, ephemeris, save=True):
+    """
+    取得 [jd0, jd1) 間的事件, 快取沒有時先建立
+    :param save: False 時快取沒有就直接計算, 不寫入快取 (供平行搜尋的 worker 使用, 避免同時寫檔)
+    :return: EVENT_DTYPE 結構陣列 (memory-mapped, 唯讀)
+    """
+    path = _covering(ephemeris, kind, jd0, jd1)
+    if path is None and not save:
+        return compute_events(kind, jd0, jd1, ephemeris)
+    cached = _open(path or build(kind, jd0, jd1, ephemeris))
+    i0, i1 = np.searchsorted(cached['tt'], [jd0, jd1])
+    return cached[i0:i1]
+
+
+def find_discrete(t0, t1, kind, ephemeris):
+    """ 同 almanac.find_discrete 的傳回值 (Time 陣列, 事件碼陣列), 但由快取取得 """
+    e = events(kind, t0.tt, t1.tt, ephemeris)
+    return ts.tt_jd(np.array(e['tt'])), np.array(e['code'])
+
+
+def find_first(t0, t1, kind, code, ephemeris):
+    """ 尋找兩個時間點間第一個指定事件, 找不到傳回 None """
+    e = events(kind, t0.tt, t1.tt, ephemeris)
+    tt = e['tt'][e['code'] == code]
+    return ts.tt_jd(tt[0]) if len(tt) else None
+
+
+if __name__ == "__main__":
+    # python event_cache.py de422.bsp [jobs]
+    build_all(sys.argv[1] if len(sys.argv) > 1 else ephemerides.resolve(),
+              int(sys.argv[2]) if len(sys.argv) > 2 else 1)
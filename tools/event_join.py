@@ -0,0 +1,72 @@
+import numpy as np
+from skyfield.api import load
+from skyfield.timelib import CalendarTuple
+
+import event_cache
+import timezones
+
+# 天象事件配對
+# 分至與月相各自一次取出整段時間的陣列 (已依時間排序), 以 searchsorted 一次配對, 不再逐一對每個冬至呼叫 find_discrete。
+
+ts = load.timescale()
+
+PAIR_DTYPE = np.dtype([
+    ('solstice_tt', '<f8'),  # 冬至時刻 (TT)
+    ('new_moon_tt', '<f8'),  # 最近的朔 (TT)
+    ('delta', '<f8'),  # 朔 - 冬至 (日)
+    ('solstice_day', '<i8'),  # 冬至所在的當地日 (JDN)
+    ('same_day', '?'),  # 朔與冬至同一當地日
+    ('ganzhi', 'i1'),  # 冬至當地日的日干支, 0 = 甲子
+])
+
+
+def nearest(left, right):
+    """
+    兩個已排序的陣列, 求 left 每一項在 right 中最接近者的索引
+    :return: index 陣列 (right 為空時為 -1)
+    """
+    left, right = np.asarray(left), np.asarray(right)
+    if len(right) < 2:
+        return np.full(len(left), len(right) - 1, dtype=np.int64)
+    i = np.clip(np.searchsorted(right, left), 1, len(right) - 1)
+    before, after = right[i - 1], right[i]
+    return np.where(np.abs(left - before) <= np.abs(after - left), i - 1, i)
+
+
+def pair_solstices_new_moons(seasons, moon_phases, offset=0.0, ut=False):
+    """
+    冬至與最近的朔配對
+    :param seasons: event_cache 的分至事件陣列
+    :param moon_phases: event_cache 的月相事件陣列 (範圍應比冬至前後各多半個月)
+    :param offset: 時差 (日) 或時區, 見 timezones.local_day
+    :return: PAIR_DTYPE 結構陣列, 每個冬至一筆
+    """
+    ws = np.array(seasons['tt'][seasons['code'] == 3])
+    nm = np.array(moon_phases['tt'][moon_phases['code'] == 0])
+    pairs = np.zeros(len(ws), dtype=PAIR_DTYPE)
+    if len(ws) == 0 or len(nm) == 0:
+        return pairs[:0]
+    nm = nm[nearest(ws, nm)]
+    ws_day = timezones.local_day(ws, offset, ut)
+    pairs['solstice_tt'] = ws
+    pairs['new_moon_tt'] = nm
+    pairs['delta'] = nm - ws
+    pairs['solstice_day'] = ws_day
+    pairs['same_day'] = ws_day == timezones.local_day(nm, offset, ut)
+    pairs['ganzhi'] = (ws_day - 11) % 60
+    return pairs
+
+
+def solstice_new_moon_pairs(jd0, jd1, ephemeris, offset=0.0, ut=False, save=True):
+    """ [jd0, jd1) 間所有冬至與最近的朔 """
+    seasons = event_cache.events(event_cache.SEASONS, jd0, jd1, ephemeris, save)
+    moon_phases = event_cache.events(event_cache.MOON_PHASES, jd0 - 16, jd1 + 16, ephemeris, save)
+    return pair_solstices_new_moons(seasons, moon_phases, offset, ut)
+
+
+def utc_tuples(tt):
+    """
+    時刻陣列一次換算 UTC, 傳回與純量 Time.utc 相同的 CalendarTuple 串列 (供逐列輸出)
+    """
+    utc = ts.tt_jd(np.asarray(tt, dtype=np.float64)).utc
+    return [CalendarTuple(int(y), int(m), int(d), int(hh), int(mm), float(ss)) for y, m, d, hh, mm, ss in zip(*utc)]
@@ -0,0 +1,173 @@
+import csv
+import os
+
+import numpy as np
+
+import event_cache
+import event_join
+import table_writer
+
+# 天象事件索引
+# 分至、月相與節氣各存成依時間排序的 EVENT_DTYPE 陣列, 每種事件碼另存一個時刻陣列, 查詢一律以 searchsorted 二分搜尋:
+#   store = event_store.from_cache(jd0, jd1, 'de422.bsp')      # 由天象快取 (event_cache)
+#   store = event_store.load('seasons_table.csv')               # 由輸出的表格 (csv, bin 目錄, 或 tianxia_calendar.txt)
+#   store.events(event_cache.MOON_PHASES, jd0, jd1, code=0)     # [jd0, jd1) 間的朔
+#   store.nearest(event_cache.MOON_PHASES, 0, jd)               # 最接近 jd 的朔
+#   store.previous(event_cache.SEASONS, 3, jd)                  # jd 之前 (含) 的冬至
+# jd 可為陣列, 一次查詢整批。查不到時傳回 nan。
+
+SEASON_COLUMN = 'Season'  # 分至表 (kalendaro.SEASONS_TABLE_COLUMNS)
+SOLAR_TERM_COLUMN = '節氣碼'  # 節氣表 (kalendaro.SOLAR_TERMS_TABLE_COLUMNS)
+EVENT_CODE_COLUMN = '天象碼'  # 天象表 (kalendaro.EVENTS_TABLE_COLUMNS), 如 S_3, M_0
+EVENT_CODE_KINDS = {'S': event_cache.SEASONS, 'M': event_cache.MOON_PHASES}
+DUPLICATE_DAYS = .5  # 合併多個檔案時, 同一事件碼相距不到半日視為同一事件 (不同次計算的結果略有差異)
+
+
+class EventStore(object):
+    def __init__(self, events):
+        """
+        :param events: {事件種類: EVENT_DTYPE 陣列}, 種類見 event_cache.SEASONS, event_cache.MOON_PHASES, event_cache.SOLAR_TERMS
+        """
+        self.kinds = {}
+        self.times = {}  # (種類, 事件碼): 排序的時刻陣列
+        for kind, e in events.items():
+            e = np.array(e, dtype=event_cache.EVENT_DTYPE)
+            e = e[np.argsort(e['tt'], kind='stable')]
+            self.kinds[kind] = e
+            for code in np.unique(e['code']).tolist():
+                self.times[kind, code] = e['tt'][e['code'] == code]
+
+    def __len__(self):
+        return sum(len(e) for e in self.kinds.values())
+
+    def __repr__(self):
+        return '<EventStore {}>'.format(', '.join('{}: {}'.format(k, len(e)) for k, e in self.kinds.items()))
+
+    def _times(self, kind, code):
+        return self.times.get((kind, code), np.empty(0))
+
+    def events(self, kind, jd0, jd1, code=None):
+        """
+        [jd0, jd1) 間的事件
+        :param code: 只取此事件碼, None 為全部
+        :return: EVENT_DTYPE 陣列
+        """
+        e = self.kinds.get(kind, np.empty(0, dtype=event_cache.EVENT_DTYPE))
+        i0, i1 = np.searchsorted(e['tt'], [jd0, jd1])
+        e = e[i0:i1]
+        return e if code is None else e[e['code'] == code]
+
+    def index_range(self, kind, code, jd0, jd1):
+        """
+        [jd0, jd1) 在事件碼 code 的時刻陣列中的索引範圍 (jd0, jd1 可為陣列)
+        :return: (i0, i1), 個數為 i1 - i0
+        """
+        tt = self._times(kind, code)
+        return np.searchsorted(tt, jd0), np.searchsorted(tt, jd1)
+
+    def count(self, kind, code, jd0, jd1):
+        """ [jd0, jd1) 間的事件數 (jd0, jd1 可為陣列) """
+        i0, i1 = self.index_range(kind, code, jd0, jd1)
+        return i1 - i0
+
+    def _take(self, tt, i, found):
+        result = np.where(found, tt[np.clip(i, 0, max(len(tt) - 1, 0))] if len(tt) else np.nan, np.nan)
+        return result if result.ndim else float(result)
+
+    def nearest(self, kind, code, jd):
+        """ 最接近 jd 的事件時刻 """
+        tt = self._times(kind, code)
+        jd = np.asarray(jd, dtype=np.float64)
+        i = event_join.nearest(np.atleast_1d(jd), tt).reshape(jd.shape)
+        return self._take(tt, i, i >= 0)
+
+    def previous(self, kind, code, jd):
+        """ jd 之前 (含 jd) 最後一個事件的時刻 """
+        tt = self._times(kind, code)
+        i = np.searchsorted(tt, jd, side='right') - 1
+        return self._take(tt, i, i >= 0)
+
+    def following(self, kind, code, jd):
+        """ jd 之後 (不含 jd) 第一個事件的時刻 """
+        tt = self._times(kind, code)
+        i = np.searchsorted(tt, jd, side='right')
+        return self._take(tt, i, i < len(tt))
+
+
+def from_cache(jd0, jd1, ephemeris, kinds=(event_cache.SEASONS, event_cache.MOON_PHASES), save=True):
+    """ 由天象快取取出 [jd0, jd1) 的事件 """
+    return EventStore({kind: event_cache.events(kind, jd0, jd1, ephemeris, save) for kind in kinds})
+
+
+def _events_from_columns(columns):
+    """ 由表格各欄 (欄名: 陣列) 取出事件, 支援分至表與天象表 """
+    tt = np.asarray(columns['JD'], dtype=np.float64)
+    if SEASON_COLUMN in columns:
+        return {event_cache.SEASONS: _event_array(tt, columns[SEASON_COLUMN])}
+    if SOLAR_TERM_COLUMN in columns:
+        return {event_cache.SOLAR_TERMS: _event_array(tt, columns[SOLAR_TERM_COLUMN])}
+    if EVENT_CODE_COLUMN in columns:
+        codes = np.asarray(columns[EVENT_CODE_COLUMN]).astype('U3')
+        prefix = np.char.partition(codes, '_')
+        events = {}
+        for key, kind in EVENT_CODE_KINDS.items():
+            mask = prefix[:, 0] == key
+            events[kind] = _event_array(tt[mask], prefix[mask, 2].astype(np.int8))
+        return events
+    raise ValueError('not an event table: no {}, {} or {} column'.format(
+        SEASON_COLUMN, SOLAR_TERM_COLUMN, EVENT_CODE_COLUMN))
+
+
+def _event_array(tt, code):
+    e = np.zeros(len(tt), dtype=event_cache.EVENT_DTYPE)
+    e['tt'], e['code'] = tt, np.asarray(code, dtype=np.int8)
+    return e
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _read_csv(path):
+    """
+    有標題列的表格傳回 {欄名: 值串列}
+    沒有標題列的檔案 (如 tianxia_calendar.txt 的筆記) 逐列辨認分至表或天象表格式的列, 其餘略過, 傳回天象表的欄位
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = [row for row in csv.reader(f) if row]
+    if rows and (SEASON_COLUMN in rows[0] or SOLAR_TERM_COLUMN in rows[0] or EVENT_CODE_COLUMN in rows[0]):
+        header = rows[0]
+        data = [row for row in rows[1:] if len(row) == len(header)]
+        return {name: [row[i] for row in data] for i, name in enumerate(header)}
+    codes, jds = [], []
+    for row in rows:
+        if len(row) > 3 and row[2] in ('0', '1', '2', '3') and _is_number(row[3]):  # 分至表: 年序,分至,Season,JD,...
+            codes.append('S_' + row[2])
+            jds.append(row[3])
+        elif len(row) > 2 and row[0][:2] in ('S_', 'M_') and _is_number(row[2]):  # 天象表: 天象碼,天象,JD,...
+            codes.append(row[0])
+            jds.append(row[2])
+    return {EVENT_CODE_COLUMN: codes, 'JD': jds}
+
+
+def load(*paths):
+    """
+    由一個或多個表格載入事件 (csv 或 txt 檔, 或 table_writer 的 bin 目錄), 同種類的事件合併
+    """
+    events = {}
+    for path in paths:
+        columns = table_writer.read_table(path) if os.path.isdir(path) else _read_csv(path)
+        for kind, e in _events_from_columns(columns).items():
+            events.setdefault(kind, []).append(e)
+    merged = {}
+    for kind, parts in events.items():
+        e = np.concatenate(parts)
+        e = e[np.argsort(e['tt'], kind='stable')]
+        keep = np.ones(len(e), dtype=bool)
+        keep[1:] = (np.diff(e['tt']) >= DUPLICATE_DAYS) | (np.diff(e['code']) != 0)  # 重疊的部分只留一筆
+        merged[kind] = e[keep]
+    return EventStore(merged)
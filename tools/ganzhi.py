@@ -0,0 +1,100 @@
+import numpy as np
+
+import batch
+import constants
+import ephemerides
+import event_cache
+import timezones
+
+# 干支 (陣列版)
+# 年、月、日、時辰干支, 0 = 甲子, 59 = 癸亥。輸入可為單一值或陣列。
+#   jd: 事件時刻 (與 constants.ganzhi_of_jd 相同, 以 jd 所在的日期計算)
+#   offset: 當地時間與 UTC 的差 (日), 例: 東八區為 8 / 24, 或時區名稱 (見 timezones.offset); 日期以 floor(jd + offset + .5) 判斷
+# 年、月以節氣為界: 立春起為寅月, 每過一個「節」換下一個月; 交節當日即屬新的月份。
+
+NAMES = np.array([constants.ganzhi_name(i) for i in range(60)])
+WEEKDAY_NAMES = np.array(constants.weekdays)
+_NAME_ORDER = np.argsort(NAMES)
+LICHUN = 21  # 立春的節氣碼 (event_cache.SOLAR_TERMS), 太陽黃經 315 度
+JIE_SEARCH_DAYS = 40  # 往前找上一個節的日數 (兩節相距約 30 日)
+
+
+def name(n):
+    """ 干支名稱, n 可為陣列 """
+    return NAMES[np.asarray(n) % 60]
+
+
+def index(names):
+    """ 干支名稱轉序號, names 可為陣列 """
+    names = np.asarray(names)
+    i = _NAME_ORDER[np.searchsorted(NAMES, names, sorter=_NAME_ORDER) % 60]
+    if np.any(NAMES[i] != names):
+        raise ValueError('unknown ganzhi name: {}'.format(names))
+    return i
+
+
+def day(jd, offset=0.0):
+    """ 日干支, 與 constants.ganzhi_of_jd 相同 """
+    return (timezones.local_day(jd, offset) - 11) % 60
+
+
+def weekday(jd, offset=0.0):
+    """ 星期, 0 = Sunday, 與 constants.weekday_of_jd 相同 """
+    return (timezones.local_day(jd, offset) + 1) % 7
+
+
+def hour(jd, offset=0.0):
+    """
+    時辰干支: 23 時起為次日子時, 甲己日起甲子時
+    """
+    local = np.asarray(jd, dtype=np.float64) + timezones.offset(offset) + .5 + 1 / 24
+    jdn = np.floor(local).astype(np.int64)
+    branch = np.floor((local - jdn) * 12).astype(np.int64)
+    return ((jdn - 11) % 5 * 12 + branch) % 60
+
+
+def year_of(year):
+    """ 以年份 (天文年號, 西元前 1 年為 0) 求年干支, 與 gonghe_calendar.year_to_ganzhi 相同 """
+    return (np.asarray(year) - 4) % 60
+
+
+def jie(tt0, tt1, ephemeris=None):
+    """
+    [tt0, tt1) 間的交節時刻, 由天象快取 (event_cache.SOLAR_TERMS) 取得
+    :return: (交節時刻陣列, 交節後的月陣列, tt0 時的月)
+    """
+    e = event_cache.events(event_cache.SOLAR_TERMS, tt0 - JIE_SEARCH_DAYS, tt1, ephemerides.resolve(ephemeris))
+    e = e[e['code'] % 2 == 1]  # 奇數為節
+    tt, months = np.array(e['tt']), ((e['code'] - LICHUN) // 2 % 12).astype(np.int64)
+    before = np.searchsorted(tt, tt0)
+    if before == 0:  # tt0 之前 JIE_SEARCH_DAYS 日內沒有節, 即在星曆表起點附近
+        raise ValueError('time out of ephemeris range: no jie before TT {}'.format(tt0))
+    return tt[before:], months[before:], int(months[before - 1])
+
+
+def solar_month(jd, offset=0.0, ephemeris=None):
+    """
+    節氣年與節氣月
+    :return: (年, 月), 年以立春為界; 月 0 = 寅月 (立春起), 11 = 丑月 (小寒起)
+    """
+    jdn = timezones.local_day(jd, offset)
+    # 以當地日結束時判斷, 交節當日即屬新月
+    day_end = jdn + .5 - timezones.offset(offset)
+    tt, months, first = jie(day_end.min() - 1, day_end.max() + 1, ephemeris)
+    month = np.append(first, months)[np.searchsorted(tt, day_end, side='right')]
+    yy, mm, _ = batch.jdn2gcal_batch(jdn)
+    # 一、二月在立春之前 (子、丑月) 屬前一年
+    year = np.where((mm <= 2) & (month >= 10), yy - 1, yy)
+    return year, month
+
+
+def year(jd, offset=0.0, ephemeris=None):
+    """ 年干支 (立春換年) """
+    y, _ = solar_month(jd, offset, ephemeris)
+    return year_of(y)
+
+
+def month(jd, offset=0.0, ephemeris=None):
+    """ 月干支 (節氣月): 甲己之年丙作首 """
+    y, m = solar_month(jd, offset, ephemeris)
+    return (12 * (y - 4) + m + 2) % 60
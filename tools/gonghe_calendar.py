@@ -1,25 +1,28 @@
-import datetime
+import argparse
+import sys
+import time
 from random import random
 
-from jdcal import jd2gcal, jd2jcal
-from skyfield import almanac
+import numpy as np
 from skyfield.api import load
 from skyfield.timelib import GREGORIAN_START
 
+import batch
 import constants
+import ephemerides
+import event_cache
+import parallel
 
 ts = load.timescale()
 ts.julian_calendar_cutoff = GREGORIAN_START
-ephemeris = "de422.bsp"  # Issued in 2008, -3000 to 3000, 623 MB
-# ephemeris = "de441_part-1.bsp"  # Issued in 2020, -13200 to 17191, 3.1 GB
-# ephemeris = "de441_part-2.bsp"  # Issued in 2020, -13200 to 17191, 3.1 GB
-eph = load(ephemeris)
+eph = ephemerides.LazyEphemeris("de422.bsp")  # Issued in 2008, -3000 to 3000, 623 MB
+# eph = ephemerides.LazyEphemeris("de441_part-1.bsp")  # Issued in 2020, -13200 to 17191, 3.1 GB
+# eph = ephemerides.LazyEphemeris("de441_part-2.bsp")  # Issued in 2020, -13200 to 17191, 3.1 GB
 
 feature_days = [
-    # NOTE: jd2gcal, jd2jcal 無法正確處理負數 JD
     # 12:00 Jan 1, 4713 BC (proleptic Julian calendar, via wiki)
-    (-2, '測試用', '資料不正確'),
-    (-1, '測試用', '資料不正確'),
+    (-2, '測試用', '負數 JD'),
+    (-1, '測試用', '負數 JD'),
     (constants.JDN_0, '儒略日起點', '西元前4713年（天文學記為-4712年）1月1日平午（世界時12:00）'),
     (constants.JDN_ZD0, '子輿日元點', ''),
     (constants.JDN_ZD0 - 2, '子輿日元點 歲首', ''),
@@ -75,19 +78,23 @@ feature_days = [
 # [2]: 儒略日來源取自 紀年轉換工具 (連結同上)
 
 def day_tuple_to_str(cal_date):
-    y, m, d, _ = cal_date
+    y, m, d = cal_date[:3]
     return '{:>6d}-{:>02d}-{:>02d}'.format(y, m, d)
 
 
+def ce_to_str(jdn):
+    # 西曆, 1582/10/15 之前為儒略曆 (與 skyfield 的 tt_strftime('%Y-%m-%d') 相同)
+    return '{}-{:02d}-{:02d}'.format(*constants.jdn2cal(jdn))
+
+
 def to_row(jdn):
     jd = jdn - .5
-    jd = 0 if jd < 0 else jd
     zd = constants.jdn2zd(jdn)
     ganzhi = constants.ganzhi_name(constants.ganzhi_of_jd(jd))
-    gh_cal = day_tuple_to_str(constants.zd2tcal_2(zd))
-    j_cal = day_tuple_to_str(jd2jcal(0, jd))
-    g_cal = day_tuple_to_str(jd2gcal(0, jd))
-    ce_cal = ts.tt_jd(jd).tt_strftime(format='%Y-%m-%d')
+    gh_cal = day_tuple_to_str(constants.zd2tcal(zd))
+    j_cal = day_tuple_to_str(constants.jdn2jcal(jdn))
+    g_cal = day_tuple_to_str(constants.jdn2gcal(jdn))
+    ce_cal = ce_to_str(jdn)
     week = constants.weekdays[constants.weekday_of_jd(jd)]
     return [jdn, zd, ce_cal, gh_cal, j_cal, g_cal, ganzhi, week]
 
@@ -106,42 +113,108 @@ def print_table(days):
 
 
 def validate():
-    # 已驗證: zd2tcal_2 與 zd2tcal_4 相等
-    for zd in range(constants.ZD_GHCal_0001_01_01 - 1, constants.ZD_GHCal_0001_01_01 + 40):
-        lval = constants.zd2tcal_2(zd)
-        rval = constants.zd2tcal_3(zd)
+    # 已驗證: zd2tcal_2 與 zd2tcal_4 相等; zd2tcal 與兩者於萬年曆全範圍相等
+    start = constants.jdn2zd(constants.JDN_WANIAN_START)
+    end = constants.jdn2zd(constants.JDN_WANIAN_END)
+    for zd in range(start, end + 1):
+        lval = constants.zd2tcal(zd)
+        rval = constants.zd2tcal_4(zd)
         same = lval == rval
         if not same:
             print('{} {} {} {}'.format(zd, lval, rval, ' ' if same else 'x'))
 
 
 def validate2():
-    # start = constants.ZD_GHCal_0001_01_01 - constants.large_leap_cycle_days * 2
-    # end = start + constants.cycle_days
+    # 兩個子輿週期, 見 verify()
     start = constants.ZDN_JD0
-    end = start + constants.cycle_days * 2
-    y, m, d, _ = constants.zd2tcal_4(start - 1)
-    start_cal = ts.tt_jd(constants.zd2jd(start)).tt_strftime(format='%Y-%m-%d')
-    end_cal = ts.tt_jd(constants.zd2jd(end)).tt_strftime(format='%Y-%m-%d')
-    print('start: {} | {} ({})'.format(
-        start_cal, day_tuple_to_str(constants.zd2tcal_4(start)), datetime.datetime.now()))
-    for zd in range(start, end):
-        cal_day = constants.zd2tcal_4(zd)
-        y, m, d = next_day(y, m, d)
-        same = cal_day == (y, m, d, .0)
-        if not same:
-            print('Fail in Next(): {} {} {} {}'.format(zd, cal_day, (y, m, d), 'x'))
-        rzd = constants.tcal2zd_2(y, m, d)
-        if zd != rzd:
-            print('Fail in Revs(): {} {} {} {}'.format(zd, cal_day, (y, m, d), 'x'))
-    print('end:   {} | {} ({})'.format(
-        end_cal, day_tuple_to_str(constants.zd2tcal_4(end)), datetime.datetime.now()))
-    print('total days: {}'.format(end - start))
+    verify(start, start + constants.cycle_days * 2)
+
+
+# 逐日驗證
+# 將 ZD 範圍切段, 每段先以陣列一次檢查 (batch 換算、逐日接續、往返), 再逐日比對純量換算 (可用 process pool 分段平行)。
+#   python gonghe_calendar.py verify [--start ZD] [--end ZD] [--jobs N] [--no-scalar]
+# 有任何不符即 exit 1, 可在修改換算程式後執行。
+
+VERIFY_CHUNK_DAYS = 1 << 18
+
+
+def _next_days(y, m, d):
+    """ next_day 的陣列版 """
+    leap = constants.is_tcal_leap_year(y)
+    last = (d == 31) | ((d == 30) & ((m % 2 == 1) | ((m == 12) & ~leap)))
+    mm = np.where(last, m % 12 + 1, m)
+    return np.where(last & (m == 12), y + 1, y), mm, np.where(last, 1, d + 1)
+
+
+def verify_chunk(zd0, zd1, scalar=True):
+    """
+    驗證 [zd0, zd1) 的換算
+    :param scalar: 是否逐日比對純量函式 (zd2tcal, zd2tcal_4, tcal2zd_2, next_day; 較慢)
+    :return: [(zd, 檢查項目, 預期, 實際), ...]
+    """
+    zd = np.arange(zd0, zd1 + 1, dtype=np.int64)  # 多取一日檢查接續
+    y, m, d, _ = batch.zd2tcal_batch(zd)
+    jdn = zd + constants.JDN_ZD0
+    mismatches = []
+
+    def check(name, ok, expected, actual):
+        for i in np.flatnonzero(~ok):
+            mismatches.append((int(zd[i]), name, expected(i), actual(i)))
+
+    ny, nm, nd = _next_days(y[:-1], m[:-1], d[:-1])
+    check('next_day', (ny == y[1:]) & (nm == m[1:]) & (nd == d[1:]),
+          lambda i: (int(y[i + 1]), int(m[i + 1]), int(d[i + 1])), lambda i: (int(ny[i]), int(nm[i]), int(nd[i])))
+    rzd = batch.tcal2zd_batch(y, m, d)[:-1]
+    check('tcal2zd_batch', rzd == zd[:-1], lambda i: int(zd[i]), lambda i: int(rzd[i]))
+    cy, cm, cd = batch.jdn2cal_batch(jdn[:-1])
+    rjdn = batch.cal2jdn_batch(cy, cm, cd)
+    check('cal2jdn_batch', rjdn == jdn[:-1], lambda i: int(jdn[i]), lambda i: int(rjdn[i]))
+    if not scalar:
+        return mismatches
+
+    for z, tcal, tcal_next in zip(zd[:-1].tolist(), zip(y.tolist(), m.tolist(), d.tolist()),
+                                  zip(y[1:].tolist(), m[1:].tolist(), d[1:].tolist())):
+        tcal4 = tcal + (.0,)
+        if constants.zd2tcal(z) != tcal4:
+            mismatches.append((z, 'zd2tcal', tcal4, constants.zd2tcal(z)))
+        if constants.zd2tcal_4(z) != tcal4:
+            mismatches.append((z, 'zd2tcal_4', tcal4, constants.zd2tcal_4(z)))
+        if constants.tcal2zd_2(*tcal) != z:
+            mismatches.append((z, 'tcal2zd_2', z, constants.tcal2zd_2(*tcal)))
+        if next_day(*tcal) != tcal_next:
+            mismatches.append((z, 'next_day', tcal_next, next_day(*tcal)))
+    return mismatches
+
+
+def _verify_span(lo, hi, a, b, scalar):
+    lo, hi = int(np.ceil(lo)), int(np.ceil(hi))  # 各段以整數日相接, 不重複
+    mismatches = []
+    for zd0 in range(lo, hi, VERIFY_CHUNK_DAYS):
+        mismatches += verify_chunk(zd0, min(zd0 + VERIFY_CHUNK_DAYS, hi), scalar)
+    return mismatches
+
+
+def verify(start=constants.ZDN_JD0, end=constants.jdn2zd(constants.JDN_WANIAN_END) + 1, jobs=1, scalar=True):
+    """
+    逐日驗證 [start, end) (ZD) 的換算, 印出所有不符之處
+    :param jobs: process 數, None 為 CPU 核心數
+    :return: [(zd, 檢查項目, 預期, 實際), ...]
+    """
+    begin = time.perf_counter()
+    print('verify: ZD {} - {} ({} - {}), {} days'.format(
+        start, end, ce_to_str(constants.JDN_ZD0 + start), ce_to_str(constants.JDN_ZD0 + end - 1), end - start))
+    chunks = parallel.map_spans(_verify_span, start, end, jobs, args=(scalar,))
+    mismatches = sorted(m for chunk in chunks for m in chunk)
+    for zd, name, expected, actual in mismatches:
+        print('Fail in {}(): ZD {} | {} | expected {}, got {}'.format(
+            name, zd, day_tuple_to_str(constants.zd2tcal(zd)), expected, actual))
+    print('{} mismatches, {:.2f} s'.format(len(mismatches), time.perf_counter() - begin))
+    return mismatches
 
 
 def next_day(y, m, d):
     yy, mm, dd = y, m, d + 1
-    if d == 31 or (d == 30 and m in [1, 3, 5, 7, 9, 11]) or (d == 30 and m == 12 and (y % 4 != 0 or y % 128 == 0)):
+    if d == 31 or (d == 30 and m in [1, 3, 5, 7, 9, 11]) or (d == 30 and m == 12 and not constants.is_tcal_leap_year(y)):
         dd = 1
         mm += 1
     if mm == 13:
@@ -155,6 +228,15 @@ def run_test(fn, zdlist):
         for zd in zdlist:
             fn(*zd)
 
+    F.__name__ = fn.__name__
+    return F
+
+
+def run_batch_test(fn, *arrays):
+    def F():
+        fn(*arrays)
+
+    F.__name__ = fn.__name__
     return F
 
 
@@ -172,7 +254,7 @@ def benchmark():
     for i in range(100000):
         zd = random() * 1000000 - 500000
         zds.append(zd)
-        tcals.append(constants.zd2tcal_4(zd))
+        tcals.append(constants.zd2tcal(zd))
     # setup = 'import constants'
     # t1 = timeit.timeit(stmt='for i in zds: constants.zd2tcal_2(i)'.format(zds), setup=setup)
     # t2 = timeit.timeit(stmt='constants.zd2tcal_4({})'.format(zds), setup=setup)
@@ -182,6 +264,13 @@ def benchmark():
     _time_analyze_(run_test(constants.tcal2zd_2, tcals))
     # _time_analyze_(run_test(constants.zd2tcal_2, zds))
     # _time_analyze_(run_test(constants.zd2tcal_4, zds))
+    _time_analyze_(run_batch_test(batch.zd2tcal_batch, zds))
+    # zd2tcal 的耗時不隨年代改變: 萬年曆起點附近 vs 終點附近
+    for jdn in [constants.JDN_WANIAN_START, constants.JDN_WANIAN_END - 100000]:
+        near = [(constants.jdn2zd(jdn) + i,) for i in range(100000)]
+        _time_analyze_(run_test(constants.zd2tcal, near))
+        _time_analyze_(run_test(constants.zd2tcal_4, near))
+    _time_analyze_(run_batch_test(batch.tcal2zd_batch, *[list(col) for col in zip(*tcals)]))
 
 
 def year_to_ganzhi(year):
@@ -193,8 +282,8 @@ def find_gonghe_origin():
     # end_time = ts.utc(-839, 12, 31)
     start_time = ts.utc(-3035, 1, 1)
     end_time = ts.utc(-3033, 12, 31)
-    t, y = almanac.find_discrete(start_time, end_time, almanac.seasons(eph))
-    # t, y = almanac.find_discrete(start_time, end_time, almanac.moon_phases(eph))
+    t, y = event_cache.find_discrete(start_time, end_time, event_cache.SEASONS, eph.name)
+    # t, y = event_cache.find_discrete(start_time, end_time, event_cache.MOON_PHASES, eph.name)
     for yi, ti in zip(y, t):
         if yi != 3:
             continue
@@ -207,7 +296,7 @@ def check_convert(days):
     for d in days:
         jd, memo = d
         expected = constants.jd2zd(jd)
-        yy, mm, dd, tt = constants.zd2tcal_4(expected)
+        yy, mm, dd, tt = constants.zd2tcal(expected)
         date_str = day_tuple_to_str((yy, mm, dd, tt))
         actual1 = constants.tcal2zd_1(yy, mm, dd, tt)
         actual2 = constants.tcal2zd_1(yy, mm, dd, tt)
@@ -218,6 +307,15 @@ def check_convert(days):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', nargs='?', choices=['verify'], help='verify: 逐日驗證換算, 預設為印出特徵日表')
+    parser.add_argument('--start', type=int, default=constants.ZDN_JD0, help='起始 ZD (含)')
+    parser.add_argument('--end', type=int, default=constants.jdn2zd(constants.JDN_WANIAN_END) + 1, help='結束 ZD (不含)')
+    parser.add_argument('--jobs', type=int, default=1, help='process 數, 0 為 CPU 核心數')
+    parser.add_argument('--no-scalar', dest='scalar', action='store_false', help='只做陣列檢查, 不逐日比對純量函式')
+    args = parser.parse_args()
+    if args.command == 'verify':
+        sys.exit(1 if verify(args.start, args.end, args.jobs or None, args.scalar) else 0)
     print_table(feature_days)
     # validate()
     # validate2()
@@ -267,9 +365,9 @@ if __name__ == "__main__":
     # print(floor_list)
     # print(ceil_list)
 
-    # print(jd2jcal(0, 0))
-    # print(jd2jcal(0, -0.7))
-    # print(jd2gcal(0, 0))
+    # print(constants.jdn2jcal(0))
+    # print(constants.jdn2jcal(-1))
+    # print(constants.jdn2gcal(0))
     # print(-2.3 // 1, -2.3 % 1)
 
     # constants.find_fraction(constants.tropical_year, 1, 1000)
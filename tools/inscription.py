@@ -0,0 +1,134 @@
+import numpy as np
+
+import batch
+import event_cache
+import ganzhi
+import timezones
+
+# 金文曆日考
+# 銘文的每一則曆日記為 (月序, 月相, 日干支), 例: 晉侯蘇鐘「正月既生霸戊午」為 (0, None, '戊午')
+#   月序: 由歲首起算, 0 = 正月
+#   月相: None 表示只要求在該月之內; 0..3 表示在該月相 (朔, 上弦, 望, 下弦) 起至下一月相前
+#   日干支: 0 = 甲子, 或干支名稱
+# 先由天象快取建立朔望月表, 再以陣列一次檢查所有年份與建子、建丑、建寅三種歲首。
+
+JIANZI, JIANCHOU, JIANYIN = 0, 1, 2  # 歲首: 建子之月之後第幾個月
+
+MONTH_DTYPE = np.dtype([
+    ('new_moon_tt', '<f8'),  # 朔 (TT)
+    ('phase_day', '<i8', (4,)),  # 朔、上弦、望、下弦所在的當地日 (JDN)
+    ('end_day', '<i8'),  # 下一個朔所在的當地日, 本月最後一日為 end_day - 1
+    ('zi', '?'),  # 建子之月, 見 build_months
+    ('solstice_tt', '<f8'),  # 冬至時刻, 非建子月為 nan
+])
+
+MATCH_DTYPE = np.dtype([
+    ('solstice_tt', '<f8'),  # 建子之月的冬至 (TT), 年份見 match_years
+    ('start', 'i1'),  # 歲首: JIANZI, JIANCHOU, JIANYIN
+    ('month', '<i8'),  # 正月在朔望月表中的索引
+    ('new_moon_tt', '<f8'),  # 正月朔 (TT)
+    ('ganzhi', 'i1'),  # 正月朔日干支, 0 = 甲子
+])
+
+# 晉侯蘇鐘: 正月既生霸戊午, 二月既望癸卯、既死霸壬寅, 六月初吉戊寅、丁亥、庚寅
+JINHOU_SU = [
+    (0, None, '戊午'),
+    (1, None, '壬寅'),
+    (1, None, '癸卯'),
+    (5, None, '戊寅'),
+    (5, None, '丁亥'),
+    (5, None, '庚寅'),
+]
+
+
+def month_table(jd0, jd1, ephemeris, offset=0.0, ut=False, save=True):
+    """
+    [jd0, jd1) 間的朔望月表
+    :param offset: 時差 (日) 或時區, 見 timezones.local_day
+    :return: MONTH_DTYPE 結構陣列, 依時間排序
+    """
+    moons = event_cache.events(event_cache.MOON_PHASES, jd0, jd1 + 60, ephemeris, save)
+    seasons = event_cache.events(event_cache.SEASONS, jd0, jd1, ephemeris, save)
+    months = build_months(moons, seasons, offset, ut)
+    return months[months['new_moon_tt'] < jd1]
+
+
+def build_months(moons, seasons, offset=0.0, ut=False):
+    """
+    由月相與分至 (event_cache.EVENT_DTYPE 陣列, 依時間排序) 排朔望月表, 只含四個月相俱全的月
+    :return: MONTH_DTYPE 結構陣列
+    """
+    phases = [np.array(moons['tt'][moons['code'] == code]) for code in range(4)]
+    new_moons = phases[0]
+    months = np.zeros(max(len(new_moons) - 1, 0), dtype=MONTH_DTYPE)
+    if len(months) == 0:
+        return months
+    months['new_moon_tt'] = new_moons[:-1]
+    months['end_day'] = timezones.local_day(new_moons[1:], offset, ut)
+    complete = np.ones(len(months), dtype=bool)
+    for code, tt in enumerate(phases):
+        i = np.searchsorted(tt, new_moons[:-1])
+        found = i < len(tt)
+        tt = tt[np.minimum(i, len(tt) - 1)] if len(tt) else np.full(len(months), np.nan)
+        complete &= found & (tt < new_moons[1:])
+        months['phase_day'][:, code] = timezones.local_day(np.where(complete, tt, new_moons[:-1]), offset, ut)
+    months, last_quarter = months[complete], tt[complete]
+    months['solstice_tt'] = np.nan
+    if len(months) == 0:
+        return months
+
+    # 建子: 冬至之後第一個下弦所在之月 (冬至在下弦之後、朔之前時為次月), 以時刻比較, 與時區無關
+    ws = np.array(seasons['tt'][seasons['code'] == 3])
+    k = np.searchsorted(last_quarter, ws, side='right')
+    inside = (k < len(months)) & (ws >= months['new_moon_tt'][0])
+    months['zi'][k[inside]] = True
+    months['solstice_tt'][k[inside]] = ws[inside]
+    return months
+
+
+def _ganzhi_index(gz):
+    return ganzhi.index(gz) if isinstance(gz, str) else gz % 60
+
+
+def match(months, constraints, starts=(JIANZI, JIANCHOU, JIANYIN), tolerance=1):
+    """
+    找出所有合於銘文曆日的年份與歲首
+    :param months: month_table() 的結果
+    :param constraints: [(月序, 月相或 None, 日干支), ...]
+    :param starts: 要檢查的歲首
+    :param tolerance: 日期範圍前後各放寬的日數 (朔日推算的誤差)
+    :return: MATCH_DTYPE 結構陣列
+    """
+    zi = np.flatnonzero(months['zi'])
+    starts = np.asarray(starts)
+    first = (zi[:, None] + starts).ravel()
+    start = np.tile(starts, len(zi))
+    year = np.repeat(zi, len(starts))
+    span = max(offset for offset, _, _ in constraints) + 1
+    ok = first + span <= len(months)
+    for offset, phase, gz in constraints:
+        m = np.where(ok, first + offset, 0)
+        if phase is None:
+            lo, hi = months['phase_day'][m, 0], months['end_day'][m] - 1
+        else:
+            lo = months['phase_day'][m, phase]
+            hi = (months['phase_day'][m, phase + 1] if phase < 3 else months['end_day'][m]) - 1
+        lo, hi = lo - tolerance, hi + tolerance
+        # [lo, hi] 間有干支為 ganzhi 的日子
+        ok &= (_ganzhi_index(gz) - (lo - 11)) % 60 <= hi - lo
+
+    matches = np.zeros(np.count_nonzero(ok), dtype=MATCH_DTYPE)
+    matches['solstice_tt'] = months['solstice_tt'][year[ok]]
+    matches['start'] = start[ok]
+    matches['month'] = first[ok]
+    matches['new_moon_tt'] = months['new_moon_tt'][first[ok]]
+    matches['ganzhi'] = (months['phase_day'][first[ok], 0] - 11) % 60
+    return matches
+
+
+def match_years(matches):
+    """
+    各結果的年份 (天文年號, 格里曆): 以歲末冬至 (次一建子之月的冬至) 之年標示, 即 solstice_tt 之年加一
+    如建子之月始於前 999 年 12 月者為前 998 年
+    """
+    return batch.jdn2gcal_batch(np.floor(matches['solstice_tt'] + .5).astype(np.int64))[0] + 1
@@ -1,7 +1,13 @@
+from math import floor
+
 import constants
+import rational
+
+SPECIAL_YEARS = [100, 400, 900]
+SPECIAL_RULES = [(4, 100, 400)]  # 格里曆
 
 
-# 求最佳閏年循環
+# 求最佳閏年循環 (逐一嘗試, 保留作為對照)
 def find_best_leap_year_loop(max_year=1000):
     # delta 高於這個值就不考慮
     tolerance = abs(constants.tropical_year * 4 - round(constants.tropical_year * 4))
@@ -27,11 +33,103 @@ def find_best_leap_year_loop(max_year=1000):
         results.append([i, *best_leap_j])
         if avg < min_avg:
             best_leap_i = (i, *best_leap_j)
+    print_leap_years(results)
+
+
+def leap_year_candidates(max_year, frac):
+    """
+    可能創下新紀錄的循環年數: 每個最佳逼近 j/i 的倍數 (誤差相同), 直到下一個更好的分母為止
+    """
+    best = [a.denominator for a in rational.best_approximations(frac, max_year)]
+    candidates = set()
+    for q, next_q in zip(best, best[1:] + [max_year + 1]):
+        candidates.update(range(q, min(next_q, max_year + 1), q))
+    return candidates
+
+
+def best_leap_years(max_year=1000, special_years=SPECIAL_YEARS, tropical_year=constants.tropical_year):
+    """
+    求最佳閏年循環, 結果與 find_best_leap_year_loop 相同, 但只檢查最佳逼近的分母, 可算到數百萬年
+    :return: [[年數, 閏數, 年均太陽日, 誤差], ...]
+    """
+    days = floor(tropical_year)
+    frac = tropical_year - days
+    tolerance = abs(tropical_year * 4 - round(tropical_year * 4))
+    candidates = leap_year_candidates(max_year, frac) | {i for i in special_years if i <= max_year}
+
+    min_delta = 1
+    results = []
+    for i in sorted(candidates):
+        # i 年中誤差最小的閏數為最接近 i * frac 的整數, 與逐一嘗試一樣限制在 1..i
+        j = min(max(round(i * frac), 1), i)
+        avg = ((i * days) + j) / i
+        delta = abs(avg - tropical_year)
+        if delta > tolerance:
+            continue
+        if delta > min_delta and i not in special_years:
+            continue
+        results.append([i, j, avg, delta])
+        min_delta = min(min_delta, delta)
+    return results
+
+
+def nested_leap_rules(max_year=1000, special_rules=SPECIAL_RULES, tropical_year=constants.tropical_year):
+    """
+    巢狀置閏規則 a/b[/c]: 每 a 年一閏, 每 b 年不閏, 每 c 年又閏 (b 為 a 的倍數, c 為 b 的倍數)
+    例: 共和曆 4/128, 格里曆 4/100/400
+    只保留循環年數遞增時誤差創新低者 (同循環年數取較簡單的規則), 以及 special_rules
+    :return: [(規則, 循環年數, 閏數, 年均太陽日, 誤差), ...]
+    """
+    days = floor(tropical_year)
+    frac = tropical_year - days
+    tolerance = abs(tropical_year * 4 - round(tropical_year * 4))
+    a = floor(1 / frac)  # 每 a 年一閏會多出一些, 由每 b 年不閏扣回
+    rules = {(a,)} | {rule for rule in special_rules if rule[-1] <= max_year}
+    for b in range(2 * a, max_year + 1, a):
+        rules.add((a, b))
+        under = frac - 1 / a + 1 / b  # 剩下的由每 c 年又閏補回
+        if under <= 0:
+            continue
+        k = max(floor(1 / under / b), 2)
+        rules.update((a, b, m * b) for m in (k, k + 1) if m * b <= max_year)
+
+    min_delta = 1
+    results = []
+    for rule in sorted(rules, key=lambda r: (r[-1], len(r), r)):
+        cycle = rule[-1]
+        leaps = sum((-1) ** k * (cycle // step) for k, step in enumerate(rule))
+        avg = ((cycle * days) + leaps) / cycle
+        delta = abs(avg - tropical_year)
+        if delta > tolerance:
+            continue
+        if delta >= min_delta and rule not in special_rules:
+            continue
+        results.append(('/'.join(map(str, rule)), cycle, leaps, avg, delta))
+        min_delta = min(min_delta, delta)
+    return results
+
+
+def print_leap_years(results):
     for r in results:
         seconds = round(r[3] * 86400, 3)
         print('{0:>4}年{1:>3}閏, 年均太陽日: {2:0.6f}, 誤差: {3:0.6f} ({4:>7.3f}秒), {5:>6}年差一天'.
-              format(*r, seconds, round(1 / r[3])))
+              format(*r, seconds, round(1 / r[3]) if r[3] else '-'))
+
+
+def print_nested_rules(results):
+    for rule, cycle, leaps, avg, delta in results:
+        seconds = round(delta * 86400, 3)
+        print('{0:>10} ({1}年{2}閏), 年均太陽日: {3:0.6f}, 誤差: {4:0.6f} ({5:>7.3f}秒), {6:>6}年差一天'.
+              format(rule, cycle, leaps, avg, delta, seconds, round(1 / delta) if delta else '-'))
+
+
+def find_best_leap_year(max_year=1000, nested=True):
+    print_leap_years(best_leap_years(max_year))
+    if nested:
+        print()
+        print_nested_rules(nested_leap_rules(max_year))
 
 
 if __name__ == "__main__":
-    find_best_leap_year_loop()
+    find_best_leap_year()
+    # find_best_leap_year(1000000)
@@ -0,0 +1,104 @@
+import numpy as np
+
+import constants
+import event_cache
+import timezones
+
+# 陰陽曆月表
+# 由朔與中氣 (event_cache 快取) 排出整段時間的每一個朔望月:
+#   月的範圍: 朔所在的當地日起, 至下一個朔所在的當地日前一日
+#   歲: 含冬至之月 (子月) 起, 至下一個子月前; 歲中有 13 個月時, 子月之後第一個無中氣之月為閏月 (無中氣置閏)
+#   月建: 以子月為 0 (子) 依序排列, 閏月與前一月同月建; 月序依歲首為建子、建丑、建寅各算一次
+# 不完整的歲 (範圍兩端) 無法判斷閏月, 所以求天象時前後各多取一年, 排好後再截取。
+
+BRANCH_NAMES = np.array(list(constants.zhi))  # 月建
+SOLAR_TERM_NAMES = ['春分', '清明', '穀雨', '立夏', '小滿', '芒種', '夏至', '小暑', '大暑', '立秋', '處暑', '白露',
+                    '秋分', '寒露', '霜降', '立冬', '小雪', '大雪', '冬至', '小寒', '大寒', '立春', '雨水', '驚蟄']  # 節氣碼順序
+ZHONGQI_NAMES = ['冬至', '大寒', '雨水', '春分', '穀雨', '小滿', '夏至', '大暑', '處暑', '秋分', '霜降', '小雪']
+JIANZI, JIANCHOU, JIANYIN = 0, 1, 2  # 歲首: 子月之後第幾個月, 同 inscription
+MARGIN_DAYS = 400  # 前後多取的天象, 讓範圍內的月都在完整的歲中
+
+MONTH_DTYPE = np.dtype([
+    ('start_zd', '<i4'),  # 朔日 (當地日) 的子輿日, JDN = start_zd + constants.JDN_ZD0
+    ('length', 'i1'),  # 日數, 29 或 30
+    ('zhongqi', 'i1'),  # 月內第一個中氣, 0 = 冬至, 1 = 大寒, ..., 11 = 小雪; -1 為無中氣
+    ('zhongqi_count', 'i1'),  # 月內中氣數 (0 ~ 2)
+    ('leap', '?'),  # 閏月
+    ('branch', 'i1'),  # 月建, 0 = 子
+    ('number', 'i1', (3,)),  # 月序 1 ~ 12: 建子, 建丑, 建寅
+])
+
+
+def zhongqi_index(code):
+    """ 節氣碼 (event_cache.SOLAR_TERMS, 偶數) 轉中氣序號, 0 = 冬至 """
+    return (np.asarray(code) // 2 - 9) % 12
+
+
+def build_months(new_moon_tt, zhongqi_tt, zhongqi, offset=0.0, ut=False):
+    """
+    由朔與中氣排月 (皆為依時間排序的陣列)
+    :param new_moon_tt: 朔的時刻
+    :param zhongqi_tt: 中氣的時刻
+    :param zhongqi: 中氣序號, 0 = 冬至
+    :param offset: 時差 (日) 或時區, 見 timezones.local_day
+    :return: MONTH_DTYPE 陣列, 只含完整的歲 (第一個子月起, 至最後一個子月前)
+    """
+    start = timezones.local_day(new_moon_tt, offset, ut)
+    n = len(start) - 1  # 最後一個朔只作為前一月的結束
+    if n <= 0:
+        return np.zeros(0, dtype=MONTH_DTYPE)
+    zq_day = timezones.local_day(np.asarray(zhongqi_tt), offset, ut)
+    zhongqi = np.asarray(zhongqi)
+    inside = (zq_day >= start[0]) & (zq_day < start[-1])
+    zhongqi = zhongqi[inside]
+    month_of = np.searchsorted(start, zq_day[inside], side='right') - 1  # 已排序
+    count = np.bincount(month_of, minlength=n)
+    first = np.full(n, -1, dtype=np.int64)
+    has, i = np.unique(month_of, return_index=True)
+    first[has] = zhongqi[i]
+
+    zi = np.unique(month_of[zhongqi == 0])  # 子月 (含冬至之月)
+    months = np.zeros(n, dtype=MONTH_DTYPE)
+    months['start_zd'] = start[:-1] - constants.JDN_ZD0
+    months['length'] = np.diff(start)
+    months['zhongqi'] = first
+    months['zhongqi_count'] = count
+    if len(zi) < 2:
+        return months[:0]
+
+    # 各歲 [zi[k], zi[k + 1]), 13 個月的歲以第一個無中氣之月為閏月
+    no_zhongqi = np.append(count == 0, True)
+    next_no_zhongqi = np.minimum.accumulate(np.where(no_zhongqi, np.arange(n + 1), n)[::-1])[::-1]
+    leap = next_no_zhongqi[zi[:-1] + 1]
+    leap = np.where((zi[1:] - zi[:-1] == 13) & (leap < zi[1:]), leap, n)
+    months['leap'][leap[leap < n]] = True
+
+    i = np.arange(zi[0], zi[-1])
+    sui = np.searchsorted(zi, i, side='right') - 1
+    branch = (i - zi[sui] - (i >= leap[sui])) % 12
+    months = months[zi[0]:zi[-1]]
+    months['branch'] = branch
+    months['number'] = (branch[:, None] - np.array([JIANZI, JIANCHOU, JIANYIN])) % 12 + 1
+    return months
+
+
+def month_table(jd0, jd1, ephemeris, offset=0.0, ut=False, save=True):
+    """
+    [jd0, jd1) 間開始的所有月
+    :param offset: 時差 (日) 或時區, 見 timezones.local_day; 例: 中國傳統曆法以東經 120 度 (8 / 24)
+    :return: MONTH_DTYPE 陣列
+    """
+    lo, hi = jd0 - MARGIN_DAYS, jd1 + MARGIN_DAYS
+    moons = event_cache.events(event_cache.MOON_PHASES, lo, hi, ephemeris, save)
+    terms = event_cache.events(event_cache.SOLAR_TERMS, lo, hi, ephemeris, save)
+    terms = terms[terms['code'] % 2 == 0]
+    months = build_months(np.array(moons['tt'][moons['code'] == 0]), np.array(terms['tt']),
+                          zhongqi_index(terms['code']), offset, ut)
+    jdn = months['start_zd'] + constants.JDN_ZD0
+    return months[(jdn >= np.floor(jd0 + .5)) & (jdn < np.floor(jd1 + .5))]
+
+
+def month_names(months, start=JIANYIN):
+    """ 月名, 如 '正月', '閏四月' """
+    names = np.array(['正', '二', '三', '四', '五', '六', '七', '八', '九', '十', '十一', '十二'])
+    return np.char.add(np.char.add(np.where(months['leap'], '閏', ''), names[months['number'][:, start] - 1]), '月')
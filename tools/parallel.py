@@ -0,0 +1,50 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import ephemerides
+
+# 長時間範圍的搜尋切成多段, 交給 process pool 平行處理。
+# 各 worker 以相同檔名開啟星曆表, jplephem 以 mmap 讀取, 實體記憶體由作業系統共用。
+
+
+def split_span(jd0, jd1, parts, overlap=0.0):
+    """
+    將 [jd0, jd1) 切成 parts 段
+    :param overlap: 每段前後多取的日數, 讓跨段的事件 (如冬至前後一日的朔) 也能找到
+    :return: [(lo, hi, a, b), ...], [lo, hi) 為該段負責回報的範圍, [a, b) 為該段需計算的範圍
+    """
+    step = (jd1 - jd0) / parts
+    spans = []
+    for i in range(parts):
+        lo = jd0 + step * i
+        hi = jd1 if i == parts - 1 else jd0 + step * (i + 1)
+        spans.append((lo, hi, lo - overlap, hi + overlap))
+    return spans
+
+
+def jobs_count(jobs=None):
+    return jobs if jobs else (os.cpu_count() or 1)
+
+
+def map_spans(fn, jd0, jd1, jobs=None, overlap=0.0, args=(), chunks_per_job=4):
+    """
+    fn(lo, hi, a, b, *args) 於各段平行執行, 依時間順序傳回各段結果
+    fn 必須是模組層級的函式 (可 pickle)
+    jobs=1 時不建立 process pool, 整段直接執行
+    """
+    jobs = jobs_count(jobs)
+    if jobs == 1:
+        return [fn(jd0, jd1, jd0 - overlap, jd1 + overlap, *args)]
+    spans = split_span(jd0, jd1, jobs * chunks_per_job, overlap)
+    with ProcessPoolExecutor(jobs, initializer=ephemerides.use, initargs=(ephemerides.resolve(None),)) as pool:
+        futures = [pool.submit(fn, *span, *args) for span in spans]
+        return [f.result() for f in futures]
+
+
+def merge(results, key=lambda row: row[0]):
+    """ 合併各段結果 (list of rows), 去除重疊區重複的資料, 並依 key 排序 """
+    rows = {}
+    for chunk in results:
+        for row in chunk:
+            rows.setdefault(key(row), row)
+    return [rows[k] for k in sorted(rows)]
@@ -0,0 +1,164 @@
+from collections import namedtuple
+from fractions import Fraction
+from math import floor, lcm
+
+import numpy as np
+
+# 有理逼近
+# 以連分數求最佳有理逼近, 時間與分母大小成對數關係, 取代逐一嘗試每個分母的 find_fraction。
+#   漸近分數 (convergent): 第二類最佳逼近, |q*x - p| 比所有更小的分母都小
+#   中間分數 (semiconvergent): 加上漸近分數後, 包含所有第一類最佳逼近, |x - p/q| 比所有更小的分母都小
+# 浮點數以其精確值 (Fraction) 展開
+
+Approximation = namedtuple('Approximation', 'numerator denominator value error')  # error = value - x
+Cycle = namedtuple('Cycle', 'years months days')
+
+SIMULTANEOUS_DTYPE = np.dtype([
+    ('days', 'i8'),  # 太陽日數 (day_cycle 的倍數)
+    ('years', 'i8'),  # 回歸年數
+    ('months', 'i8'),  # 朔望月數
+    ('year_error', 'f8'),  # 日數 - 年數 * 回歸年 (日)
+    ('month_error', 'f8'),  # 日數 - 月數 * 朔望月 (日)
+    ('error', 'f8'),  # 兩者絕對值的最大者
+])
+
+
+def continued_fraction(x, max_terms=64):
+    """
+    連分數展開 [a0; a1, a2, ...]
+    """
+    x = Fraction(x)
+    terms = []
+    while len(terms) < max_terms:
+        a = floor(x)
+        terms.append(a)
+        if x == a:
+            break
+        x = 1 / (x - a)
+    return terms
+
+
+def _approximation(x, p, q):
+    return Approximation(p, q, p / q, float(Fraction(p, q) - x))
+
+
+def _expand(x, max_denominator):
+    """
+    依分母遞增產生 (p, q, 是否為漸近分數), 包含所有漸近分數與中間分數
+    """
+    x = Fraction(x)
+    p0, q0, p1, q1 = 0, 1, 1, 0
+    rest = x
+    while True:
+        a = floor(rest)
+        # 中間分數 (p[k-1] + t*p[k]) / (q[k-1] + t*q[k]), t = a 時即下一個漸近分數
+        for t in range(1 if q1 else a, a + 1):
+            q = q0 + t * q1
+            if q > max_denominator:
+                return
+            yield p0 + t * p1, q, t == a
+        p0, q0, p1, q1 = p1, q1, p0 + a * p1, q0 + a * q1
+        if rest == a:
+            return
+        rest = 1 / (rest - a)
+
+
+def convergents(x, max_denominator):
+    """
+    分母不超過 max_denominator 的漸近分數
+    :return: [Approximation, ...], 依分母遞增
+    """
+    x = Fraction(x)
+    return [_approximation(x, p, q) for p, q, is_convergent in _expand(x, max_denominator) if is_convergent]
+
+
+def best_approximations(x, max_denominator, min_denominator=1):
+    """
+    第一類最佳逼近: |x - p/q| 比所有更小的分母都小
+    :param min_denominator: 只傳回分母不小於此值者
+    :return: [Approximation, ...], 依分母遞增
+    """
+    x = Fraction(x)
+    results = []
+    best = None
+    for p, q, _ in _expand(x, max_denominator):
+        e = abs(x - Fraction(p, q))
+        if best is not None and e >= best:
+            continue
+        if results and results[-1].denominator == q:  # 分母同為 1 時 (floor(x)/1 之後的 ceil(x)/1) 只留較近者
+            results.pop()
+        best = e
+        if q >= min_denominator:
+            results.append(_approximation(x, p, q))
+    return results
+
+
+def best_approximation(x, max_denominator):
+    """ 分母不超過 max_denominator 中最接近 x 的分數 """
+    x = Fraction(x)
+    f = x.limit_denominator(max_denominator)
+    return _approximation(x, f.numerator, f.denominator)
+
+
+def common_cycle(year, month, day_cycle=60):
+    """
+    以分數表示的回歸年與朔望月, 求年、月、干支同時循環的最短週期
+    例: 365 + 752/3105 與 29 + 3261/6146
+    :return: Cycle(年數, 月數, 日數)
+    """
+    year, month = Fraction(year), Fraction(month)
+    days = lcm(year.numerator, month.numerator, day_cycle)
+    return Cycle(int(days / year), int(days / month), days)
+
+
+def simultaneous_approximations(year, month, max_years, day_cycle=60, chunk_size=1000000):
+    """
+    同時逼近: 日數為 day_cycle 的倍數, 且接近整數個回歸年與整數個朔望月
+    只傳回日數遞增時誤差 (年、月誤差的最大者) 創新低者
+    :param max_years: 最多年數
+    :return: SIMULTANEOUS_DTYPE 陣列
+    """
+    max_k = int(max_years * year // day_cycle)
+    best = np.inf
+    records = []
+    for k0 in range(1, max_k + 1, chunk_size):
+        days = np.arange(k0, min(k0 + chunk_size, max_k + 1), dtype=np.int64) * day_cycle
+        years = np.rint(days / year)
+        months = np.rint(days / month)
+        year_error = days - years * year
+        month_error = days - months * month
+        error = np.maximum(np.abs(year_error), np.abs(month_error))
+        error[years == 0] = np.inf
+        # 區段內的紀錄: 比前面所有的都小
+        before = np.minimum.accumulate(np.concatenate([[best], error[:-1]]))
+        i = np.flatnonzero(error < before)
+        if len(i) == 0:
+            continue
+        chunk = np.zeros(len(i), dtype=SIMULTANEOUS_DTYPE)
+        chunk['days'], chunk['years'], chunk['months'] = days[i], years[i], months[i]
+        chunk['year_error'], chunk['month_error'], chunk['error'] = year_error[i], month_error[i], error[i]
+        records.append(chunk)
+        best = min(best, error.min())
+    if not records:
+        return np.zeros(0, dtype=SIMULTANEOUS_DTYPE)
+    return np.concatenate(records)
+
+
+def print_approximations(x, approximations):
+    print('target: {}'.format(x))
+    for a in approximations:
+        op = '+' if a.error > 0 else '-'
+        print('{0:>4d} /{1:>4d} | value: {2:.9f}, delta: {4:} {3:0.9f}'.format(
+            a.numerator, a.denominator, a.value, abs(a.error), op))
+
+
+if __name__ == "__main__":
+    import constants
+
+    print(continued_fraction(constants.tropical_year, 8))
+    print_approximations(constants.tropical_year, best_approximations(constants.tropical_year, 10000))
+    print_approximations(constants.synodic_month, best_approximations(constants.synodic_month, 10000))
+    print(common_cycle(Fraction(365 * 3105 + 752, 3105), Fraction(29 * 6146 + 3261, 6146)))
+    for r in simultaneous_approximations(constants.tropical_year, constants.synodic_month, 20000):
+        print('{:>6}年 {:>7}月 {:>8}日 年差 {:+.6f} 月差 {:+.6f}'.format(
+            r['years'], r['months'], r['days'], r['year_error'], r['month_error']))
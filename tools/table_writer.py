@@ -0,0 +1,203 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# 串流輸出表格
+# 資料以「欄位陣列」分批寫出 (每批一個 dict: 欄名 -> 陣列), 記憶體用量只跟每批大小有關。
+#   csv: 與原本 print() 輸出相同的逗號分隔文字
+#   bin: 一個目錄, schema.json 記錄欄名與型別, 每欄一個 little-endian 二進位檔, 可用 read_table() memory-map 讀回
+# append=True 時接在既有檔案之後 (中斷時寫到一半的最後一列會先截掉), 搭配 last_row() 由上次的最後一列接續。
+
+FORMATS = ('csv', 'bin')
+CHUNK_ROWS = 10000
+BUFFER_SIZE = 1 << 20
+
+
+def _csv_header(columns):
+    return ','.join(name for name, _ in columns)
+
+
+def _truncate_partial_line(path):
+    """ 截掉檔尾沒有換行的不完整列, 傳回檔案是否還有內容 """
+    with open(path, 'rb+') as f:
+        size = end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - BUFFER_SIZE, 0)
+            f.seek(start)
+            i = f.read(end - start).rfind(b'\n')
+            end = start + i + 1 if i >= 0 else start
+            if i >= 0:
+                break
+        if end < size:
+            f.truncate(end)
+        return end > 0
+
+
+class CsvTableWriter(object):
+    def __init__(self, path, columns, buffer_size=BUFFER_SIZE, append=False):
+        """
+        :param path: 檔名, None 或 '-' 為 stdout
+        :param columns: [(欄名, dtype), ...]
+        :param append: 接在既有檔案之後 (欄名須相同)
+        """
+        self.columns = columns
+        header = _csv_header(columns)
+        if path in (None, '-'):
+            self.file, self.owned = sys.stdout, False
+        elif append and os.path.exists(path) and _truncate_partial_line(path):
+            with open(path, encoding='utf-8') as f:
+                existing = f.readline().rstrip('\r\n')
+            if existing != header:
+                raise ValueError('column mismatch: {} ({})'.format(path, existing))
+            self.file, self.owned = open(path, 'a', buffering=buffer_size, encoding='utf-8', newline=''), True
+            return
+        else:
+            self.file, self.owned = open(path, 'w', buffering=buffer_size, encoding='utf-8', newline=''), True
+        self.file.write(header + '\n')
+
+    def write(self, chunk):
+        cols = [np.asarray(chunk[name]).tolist() for name, _ in self.columns]
+        self.file.write(''.join(','.join(map(str, row)) + '\n' for row in zip(*cols)))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BinaryTableWriter(object):
+    def __init__(self, path, columns, buffer_size=BUFFER_SIZE, append=False):
+        """
+        :param path: 輸出目錄
+        :param columns: [(欄名, dtype), ...], 文字欄請用定長 unicode (如 'U2')
+        :param append: 接在既有資料之後 (欄名、型別須相同)
+        """
+        os.makedirs(path, exist_ok=True)
+        self.columns = [(name, np.dtype(dtype).newbyteorder('<')) for name, dtype in columns]
+        schema = [{'name': name, 'dtype': dtype.str, 'file': 'col{:02d}.bin'.format(i)}
+                  for i, (name, dtype) in enumerate(self.columns)]
+        self.rows = 0
+        if append:
+            schema_path = os.path.join(path, 'schema.json')
+            if os.path.exists(schema_path):
+                with open(schema_path, encoding='utf-8') as f:
+                    existing = json.load(f)['columns']
+                if existing != schema:
+                    raise ValueError('column mismatch: {}'.format(path))
+            self.rows = _binary_rows(path, schema)
+        mode = 'ab' if append else 'wb'
+        self.files = [open(os.path.join(path, col['file']), mode, buffering=buffer_size) for col in schema]
+        self.path = path
+        self.schema = schema
+
+    def write(self, chunk):
+        for (name, dtype), f in zip(self.columns, self.files):
+            f.write(np.ascontiguousarray(chunk[name], dtype=dtype).tobytes())
+        self.rows += len(chunk[self.columns[0][0]])
+
+    def _write_schema(self):
+        with open(os.path.join(self.path, 'schema.json'), 'w', encoding='utf-8') as f:
+            json.dump({'rows': self.rows, 'columns': self.schema}, f, ensure_ascii=False, indent=1)
+
+    def flush(self):
+        for f in self.files:
+            f.flush()
+        self._write_schema()
+
+    def close(self):
+        for f in self.files:
+            f.close()
+        self._write_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _binary_rows(path, schema):
+    """ 既有 bin 表格的完整列數, 各欄檔案截到同一列數 (中斷時各欄可能寫到不同位置) """
+    rows = None
+    for col in schema:
+        filename = os.path.join(path, col['file'])
+        size = os.path.getsize(filename) if os.path.exists(filename) else 0
+        n = size // np.dtype(col['dtype']).itemsize
+        rows = n if rows is None else min(rows, n)
+    for col in schema:
+        filename = os.path.join(path, col['file'])
+        if os.path.exists(filename):
+            with open(filename, 'rb+') as f:
+                f.truncate(rows * np.dtype(col['dtype']).itemsize)
+    return rows or 0
+
+
+def open_table(path, columns, fmt='csv', append=False):
+    if fmt == 'csv':
+        return CsvTableWriter(path, columns, append=append)
+    if fmt == 'bin':
+        return BinaryTableWriter(path, columns, append=append)
+    raise ValueError('unknown table format: {}'.format(fmt))
+
+
+def last_row(path, columns, fmt='csv'):
+    """
+    既有表格的最後一列, 供接續計算 (中斷時寫到一半的列會先截掉)
+    :return: {欄名: 值}, 檔案不存在或沒有資料時為 None
+    """
+    if fmt == 'bin':
+        if not os.path.isdir(path):
+            return None
+        schema = [{'name': name, 'dtype': np.dtype(dtype).newbyteorder('<').str, 'file': 'col{:02d}.bin'.format(i)}
+                  for i, (name, dtype) in enumerate(columns)]
+        rows = _binary_rows(path, schema)
+        if rows == 0:
+            return None
+        return {col['name']: np.fromfile(os.path.join(path, col['file']), dtype=col['dtype'],
+                                         offset=(rows - 1) * np.dtype(col['dtype']).itemsize)[0].item()
+                for col in schema}
+    if path in (None, '-') or not os.path.exists(path) or not _truncate_partial_line(path):
+        return None
+    with open(path, 'rb') as f:
+        header = f.readline().decode('utf-8').rstrip('\r\n')
+        f.seek(max(f.seek(0, os.SEEK_END) - BUFFER_SIZE, 0))
+        lines = f.read().decode('utf-8', errors='ignore').splitlines()
+    if not lines or lines[-1] == header:
+        return None
+    dtypes = dict(columns)
+    row = {}
+    for name, value in zip(header.split(','), lines[-1].split(',')):
+        kind = np.dtype(dtypes.get(name, 'U')).kind
+        row[name] = int(value) if kind in 'iu' else float(value) if kind == 'f' else value
+    return row
+
+
+def read_table(path):
+    """ 讀回 bin 格式的表格, 傳回 {欄名: memory-mapped 陣列} """
+    with open(os.path.join(path, 'schema.json'), encoding='utf-8') as f:
+        schema = json.load(f)
+    table = {}
+    for col in schema['columns']:
+        filename = os.path.join(path, col['file'])
+        if schema['rows'] == 0:
+            table[col['name']] = np.empty(0, dtype=col['dtype'])
+        else:
+            table[col['name']] = np.memmap(filename, dtype=col['dtype'], mode='r', shape=(schema['rows'],))
+    return table
+
+
+def add_arguments(parser):
+    parser.add_argument('-o', '--output', default='-', help='輸出檔 (csv) 或目錄 (bin), 預設為 stdout')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='csv', help='輸出格式')
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import numpy as np
+from pytz import timezone
+from skyfield.api import load
+
+# 時區
+# 事件陣列以「當地日」(JDN) 判斷同日、干支時, 只需要一個固定的時差, 不必對每個事件呼叫 astimezone。
+# 時差 (offset) 一律以日為單位, 當地時間 = UTC + offset, 例: 東八區為 8 / 24。
+#   offset(8 / 24)             # 數值: 原樣傳回
+#   offset('Asia/Taipei')      # 時區名稱 / pytz 時區: 以 REFERENCE_DATE 的標準時差 (只算一次)
+#   offset('北京')              # MERIDIANS 中的地名: 地方平時 (經度 / 360)
+#   offset(meridian(116.4))    # 任意經度的地方平時
+
+TZ_CST = timezone('Asia/Taipei')
+TZ_GMT = timezone('Europe/London')
+REFERENCE_DATE = datetime(2000, 1, 1)  # 取 pytz 時差的日期 (避開 LMT 與夏令時間)
+
+# 地方平時 (Local Mean Time) 的經度 (度, 東經為正)
+MERIDIANS = {
+    '格林威治': 0.0,
+    '北京': 116.4,
+    '南京': 118.8,
+    '西安': 108.9,
+    '洛陽': 112.45,
+    '臺北': 121.5,
+}
+
+ts = load.timescale()
+_offsets = {}  # tz: offset (日)
+
+
+def meridian(longitude):
+    """ 地方平時的時差 (日) """
+    return longitude / 360
+
+
+def offset(tz):
+    """
+    時差 (日)
+    :param tz: 數值 (日), 時區名稱, pytz 時區, 或 MERIDIANS 中的地名
+    """
+    if tz is None:
+        return 0.0
+    if isinstance(tz, (int, float, np.number)):
+        return float(tz)
+    if tz not in _offsets:
+        if tz in MERIDIANS:
+            _offsets[tz] = meridian(MERIDIANS[tz])
+        else:
+            zone = timezone(tz) if isinstance(tz, str) else tz
+            _offsets[tz] = zone.utcoffset(REFERENCE_DATE).total_seconds() / 86400
+    return _offsets[tz]
+
+
+def local_day(tt, tz=0.0, ut=False):
+    """
+    事件時刻所在的當地日 (JDN), tt 可為陣列
+    :param tz: 時差, 見 offset()
+    :param ut: True 時以 UT1 判斷日期 (民用日), 否則以 TT
+    """
+    jd = ts.tt_jd(tt).ut1 if ut else np.asarray(tt, dtype=np.float64)
+    return np.floor(jd + offset(tz) + .5).astype(np.int64)
+
+
+def same_day(tt0, tt1, tz=0.0, ut=False):
+    """ 兩組時刻是否在同一當地日 (逐項比較) """
+    return local_day(tt0, tz, ut) == local_day(tt1, tz, ut)
+
+
+def is_jiazi(tt, tz=0.0, ut=False):
+    """ 時刻所在的當地日是否為甲子日 """
+    return (local_day(tt, tz, ut) - 11) % 60 == 0
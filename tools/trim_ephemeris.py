@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+from jplephem.excerpter import write_excerpt
+from jplephem.spk import SPK
+
+import constants
+import event_cache
+
+# 精簡星曆表
+# 分至、月相、節氣只用到太陽、地球、月球 (及視位置光線偏折用到的木星、土星質心),
+# 由 de422 / de441 取出這幾個 segment 與所需的年代, 另存成小檔 (如 kalendaro.bsp),
+# 開啟與 memory-map 都快得多; 多項式係數原樣複製, 求得的天象時刻與原星曆表相同。
+#   python trim_ephemeris.py de441_part-1.bsp kalendaro.bsp --start -5000 --end 1969
+#   python trim_ephemeris.py de422.bsp kalendaro.bsp --check   # 全部年代, 並比對天象時刻
+# de441 分為兩個檔 (part-1 至 1969 年, part-2 自 1969 年), skyfield 同一對天體只取一個 segment, 所以一次只能由一個檔取出。
+
+SEGMENTS = [  # (center, target)
+    (0, 3),  # 太陽系質心 -> 地月質心
+    (0, 5),  # 太陽系質心 -> 木星質心 (apparent() 的光線偏折)
+    (0, 6),  # 太陽系質心 -> 土星質心 (同上)
+    (0, 10),  # 太陽系質心 -> 太陽
+    (3, 301),  # 地月質心 -> 月球
+    (3, 399),  # 地月質心 -> 地球
+]
+CHECK_KINDS = (event_cache.SEASONS, event_cache.MOON_PHASES, event_cache.SOLAR_TERMS)
+CHECK_SAMPLES = 8  # 比對天象時, 在範圍內平均取幾段
+CHECK_DAYS = 400  # 每段的日數
+TOLERANCE_SECONDS = .001  # 天象時刻容許的差 (秒), 同 find_discrete 的精度
+
+
+def year_jd(year):
+    """ 西曆年 (天文年號) 1 月 1 日 0 時的 JD """
+    return constants.cal2jdn(year, 1, 1) - .5
+
+
+def trim(input_path, output_path, jd0=None, jd1=None, segments=SEGMENTS):
+    """
+    由 input_path 取出 segments 在 [jd0, jd1] 的部分, 寫成 output_path
+    :param jd0: None 為原星曆表的起點
+    :param jd1: None 為原星曆表的終點
+    :return: 實際寫出的 (jd0, jd1)
+    """
+    spk = SPK.open(input_path)
+    try:
+        found = {(s.center, s.target): s for s in spk.segments}
+        missing = [pair for pair in segments if pair not in found]
+        if missing:
+            raise ValueError('segment not found in {}: {}'.format(input_path, missing))
+        first = max(found[pair].start_jd for pair in segments)
+        last = min(found[pair].end_jd for pair in segments)
+        jd0 = first if jd0 is None else max(jd0, first)
+        jd1 = last if jd1 is None else min(jd1, last)
+        if jd0 >= jd1:
+            raise ValueError('no data in {} between JD {} and {}'.format(input_path, jd0, jd1))
+        # summary: (start, end, target, center, frame, type, start_i, end_i)
+        summaries = [(name, values) for name, values in spk.daf.summaries()
+                     if (values[3], values[2]) in segments]
+        tmp_path = '{}.{}.tmp'.format(output_path, os.getpid())
+        with open(tmp_path, 'w+b') as f:
+            write_excerpt(spk, f, jd0, jd1, summaries)
+        os.replace(tmp_path, output_path)
+    finally:
+        spk.close()
+    return jd0, jd1
+
+
+def check(full, trimmed, jd0=None, jd1=None, kinds=CHECK_KINDS, samples=CHECK_SAMPLES, days=CHECK_DAYS,
+          tolerance=TOLERANCE_SECONDS):
+    """
+    比對兩個星曆表求得的天象時刻 (不經快取), 在 [jd0, jd1] 間平均取 samples 段, 每段 days 日
+    :param full: 原星曆表
+    :param trimmed: 精簡後的星曆表
+    :return: [(種類, 段起點 JD, 原事件數, 精簡後事件數, 最大差 (秒)), ...], 與是否全部在 tolerance 之內
+    """
+    lo, hi = event_cache._coverage(trimmed)
+    full_lo, full_hi = event_cache._coverage(full)
+    lo, hi = max(lo, full_lo), min(hi, full_hi)
+    lo = lo if jd0 is None else max(lo, jd0)
+    hi = hi if jd1 is None else min(hi, jd1)
+    starts = np.linspace(lo, max(hi - days, lo), samples)
+    results, ok = [], True
+    for kind in kinds:
+        for a in starts.tolist():
+            b = min(a + days, hi)
+            e0 = event_cache.compute_events(kind, a, b, full)
+            e1 = event_cache.compute_events(kind, a, b, trimmed)
+            if len(e0) != len(e1) or (e0['code'] != e1['code']).any():
+                diff = np.inf  # 事件數或種類不同
+            else:
+                diff = float(np.abs(e0['tt'] - e1['tt']).max(initial=0) * 86400)
+            ok &= diff <= tolerance
+            results.append((kind, a, len(e0), len(e1), diff))
+    return results, ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='由 JPL 星曆表取出日、地、月的部分, 另存為精簡的星曆表')
+    parser.add_argument('input', help='原星曆表, 如 de422.bsp, de441_part-1.bsp')
+    parser.add_argument('output', nargs='?', default='kalendaro.bsp', help='輸出檔, 預設為 kalendaro.bsp')
+    parser.add_argument('--start', type=int, help='起始年 (天文年號, 含), 預設為原星曆表的起點')
+    parser.add_argument('--end', type=int, help='結束年 (不含), 預設為原星曆表的終點')
+    parser.add_argument('--check', action='store_true', help='寫出後比對兩個星曆表求得的天象時刻')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE_SECONDS, help='容許的時刻差 (秒)')
+    args = parser.parse_args(argv)
+
+    jd0, jd1 = trim(args.input, args.output,
+                    None if args.start is None else year_jd(args.start),
+                    None if args.end is None else year_jd(args.end))
+    print('{}: JD {} - {}, {:.1f} MB -> {:.1f} MB'.format(
+        args.output, jd0, jd1, os.path.getsize(args.input) / 2 ** 20, os.path.getsize(args.output) / 2 ** 20))
+    if args.check:
+        results, ok = check(args.input, args.output, jd0, jd1, tolerance=args.tolerance)
+        for kind, a, n0, n1, diff in results:
+            print('{},{},{},{},{:.6f}'.format(kind, a, n0, n1, diff))
+        if not ok:
+            print('MISMATCH: event times differ by more than {} s'.format(args.tolerance), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
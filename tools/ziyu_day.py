@@ -1,19 +1,18 @@
 from datetime import timedelta
-from math import modf, floor
+from math import floor
 
-from skyfield import almanac
+import numpy as np
 from skyfield.api import load
 
 import constants
-
-# Ephemeris: 曆書, 星曆表。
-# ref.: https://rhodesmill.org/skyfield/planets.html
-# ephemeris = "de422.bsp"  # Issued in 2008, -3000 to 3000, 623 MB
-# ephemeris = "de441.bsp"  # Issued in 2020, -13200 to 17191, 3.1 GB
-ephemeris = "de441_part-1.bsp"  # Issued in 2020, -13200 to 17191, 3.1 GB
-# ephemeris = "kalendaro.bsp"  # Issued in 2020, -5000 to 3000, based on de441.bsp
-
-eph = load(ephemeris)
+import cycle_search
+import ephemerides
+import event_cache
+import event_join
+import parallel
+
+# Ephemeris: 曆書, 星曆表。可選用的星曆表見 ephemerides.py
+eph = ephemerides.LazyEphemeris("de441_part-1.bsp")  # Issued in 2020, -13200 to 17191, 3.1 GB
 ts = load.timescale()
 
 
@@ -39,17 +38,13 @@ def find_winter_solstice(t0, t1):
     :param t1:
     :return:
     """
-    t, y = almanac.find_discrete(t0, t1, almanac.seasons(eph))
-    for yi, ti in zip(y, t):
-        """
-        0 春分 Vernal Equinox   / March Equinox
-        1 夏至 Summer Solstice  / June Solstice
-        2 秋分 Autumnal Equinox / September Equinox
-        3 冬至 Winter Solstice  / December Solstice
-        """
-        if yi == 3:
-            return ti
-    return None
+    """
+    0 春分 Vernal Equinox   / March Equinox
+    1 夏至 Summer Solstice  / June Solstice
+    2 秋分 Autumnal Equinox / September Equinox
+    3 冬至 Winter Solstice  / December Solstice
+    """
+    return event_cache.find_first(t0, t1, event_cache.SEASONS, 3, eph.name)
 
 
 def find_new_moon(t0, t1):
@@ -59,58 +54,64 @@ def find_new_moon(t0, t1):
     :param t1:
     :return:
     """
-    t, y = almanac.find_discrete(t0, t1, almanac.moon_phases(eph))
-    for yi, ti in zip(y, t):
-        """
-        0 新月 New Moon
-        1 上弦 First Quarter
-        2 滿月 Full Moon
-        3 下弦 Last Quarter
-        """
-        if yi == 0:
-            return ti
-    return None
-
-
-def find_new_moon_winter_solstice(start_time, end_time):
+    """
+    0 新月 New Moon
+    1 上弦 First Quarter
+    2 滿月 Full Moon
+    3 下弦 Last Quarter
+    """
+    return event_cache.find_first(t0, t1, event_cache.MOON_PHASES, 0, eph.name)
+
+
+def search_new_moon_winter_solstice(lo, hi, a, b, ephemeris, save=True):
+    """
+    求 [lo, hi) 間的朔旦冬至, 朔日由 [a, b) 間的月相中尋找 (供 parallel.map_spans 分段呼叫)
+    :return: [(年, 月, 日, JD, 冬至時刻, 朔時刻), ...]
+    """
+    seasons = event_cache.events(event_cache.SEASONS, lo, hi, ephemeris, save)
+    moons = event_cache.events(event_cache.MOON_PHASES, a, b, ephemeris, save)
+    pairs = event_join.pair_solstices_new_moons(seasons, moons)
+    pairs = pairs[(np.abs(pairs['delta']) <= 1) & pairs['same_day'] & (pairs['ganzhi'] == 0)]
+    if len(pairs) == 0:  # 空的 Time 陣列無法換算日期; 分段搜尋時大部分的段都沒有
+        return []
+    # 整段一次換算 (Time 陣列), 不逐筆建立 Time
+    ti, tnm = ts.tt_jd(pairs['solstice_tt']), ts.tt_jd(pairs['new_moon_tt'])  # time new moon, 朔日
+    y, m, d, _, _, _ = ti.tt_calendar()
+    jd = ts.utc(y, m, d).tt
+    return list(zip(y.tolist(), m.tolist(), d.tolist(), jd.tolist(), ti.utc_iso(), tnm.utc_iso()))
+
+
+def find_new_moon_winter_solstice(start_time, end_time, jobs=1):
     """求朔旦冬至
     :param start_time:
     :param end_time:
-    :param timezone:
+    :param jobs: process 數, None 為 CPU 核心數; 大於 1 時分段平行搜尋
     :return:
     """
-    t, y = almanac.find_discrete(start_time, end_time, almanac.seasons(eph))
+    save = parallel.jobs_count(jobs) == 1
+    chunks = parallel.map_spans(search_new_moon_winter_solstice, start_time.tt, end_time.tt, jobs,
+                                overlap=2, args=(eph.name, save))
+    results = parallel.merge(chunks, key=lambda row: row[3])
     print('日期, JD, 冬至, 朔旦')
-    for yi, ti in zip(y, t):
-        if yi != 3:
-            continue
-        ti0, ti1 = ts.tt_jd(ti.tt - 1), ts.tt_jd(ti.tt + 1)
-        tnm = find_new_moon(ti0, ti1)  # time new moon, 朔日
-        if tnm is None:
-            continue
-        if not is_same_day(ti, tnm):
-            continue
-        if ganzhi_of_jd(ti.tt) != 0:
-            continue
-        y, m, d, _, _, _ = ti.tt_calendar()
-        jd = ts.utc(y, m, d).tt
-        print('{:>5}/{:>02}/{:>02}, {:>12.4f}, {}, {}'.format(y, m, d, jd, ti.utc_iso(), tnm.utc_iso()))
-    #     results.append(jd)
-    # return results
+    for r in results:
+        print('{:>5}/{:>02}/{:>02}, {:>12.4f}, {}, {}'.format(*r))
+    return [r[3] for r in results]
 
 
 def find_3034(start_time, end_time):
-    t, y = almanac.find_discrete(start_time, end_time, almanac.seasons(eph))
-    for yi, ti in zip(y, t):
-        if yi != 3:
-            continue
-        ti0, ti1 = ts.tt_jd(ti.tt - 3), ts.tt_jd(ti.tt + 3)
-        tnm = find_new_moon(ti0, ti1)  # time new moon, 朔日
-        if tnm is None:
-            continue
-        y, m, d, _, _, _ = ti.tt_calendar()
-        jd = ts.utc(y, m, d).tt
-        print(y, m, d, jd, ti.utc, tnm.utc)
+    """ 列出冬至前後三日內有朔者 (冬至與朔以陣列一次配對) """
+    seasons = event_cache.events(event_cache.SEASONS, start_time.tt, end_time.tt, eph.name)
+    moons = event_cache.events(event_cache.MOON_PHASES, start_time.tt - 3, end_time.tt + 3, eph.name)
+    pairs = event_join.pair_solstices_new_moons(seasons, moons)
+    pairs = pairs[(pairs['delta'] >= -3) & (pairs['delta'] < 3)]
+    if len(pairs) == 0:
+        return
+    y, m, d, _, _, _ = ts.tt_jd(pairs['solstice_tt']).tt_calendar()
+    jd = ts.utc(y, m, d).tt
+    rows = zip(y.tolist(), m.tolist(), d.tolist(), jd.tolist(),
+               event_join.utc_tuples(pairs['solstice_tt']), event_join.utc_tuples(pairs['new_moon_tt']))
+    for row in rows:
+        print(*row)
 
 
 def find_cycle(solar_len, lunar_len, max_year=7000):
@@ -133,31 +134,17 @@ def find_cycle(solar_len, lunar_len, max_year=7000):
         3. 西元前 3200年 左右：蘇美人發明楔形文字
     """
     # 1章19歲, 1蔀76歲, 391年144閏(大明曆,祖沖之), 1紀1520歲, 1統1539年, 1元4560歲
-    special_years = [19, 76, 391, 1520, 1539, 4560]
-    max_time_part = 0.5  # 最後一天至少要過半天
+    # 最後一天至少要過半天, 或 22 小時之後; 向量化計算見 cycle_search.py
     print('回歸年數, 朔望月數, 太陽日數, 年循環最後一日餘時, 月循環最後一日餘時, 合甲子, 合七曜, 年循環太陽日數, 月循環太陽日數, 年循環月循環同日')
-    for i in range(max_year):
-        j = round(i * solar_len / lunar_len)
-        solar_days, lunar_days = i * solar_len, j * lunar_len
-        time_part_of_solar_days, day_part_of_solar_days = modf(solar_days)
-        time_part_of_lunar_days, day_part_of_lunar_days = modf(lunar_days)
-        if i not in special_years:
-            if day_part_of_solar_days != day_part_of_lunar_days:
-                continue
-            time_part = min(time_part_of_solar_days, time_part_of_lunar_days)
-            if time_part > max_time_part:
-                max_time_part = time_part
-            elif time_part < 0.916667:  # 22 小時之後
-                continue
-        days = int(solar_days) + 1
-        check_jiazi = 'x' if (days % 60) == 0 else ' '
-        check_week = 'x' if (days % 7) == 0 else ' '
-        check_same_day = 'x' if day_part_of_solar_days == day_part_of_lunar_days else ' '
-        time_part_solar = str(timedelta(days=time_part_of_solar_days))[:-7]
-        time_part_lunar = str(timedelta(days=time_part_of_lunar_days))[:-7]
+    for c in cycle_search.find_cycles(solar_len, lunar_len, max_year):
+        check_jiazi = 'x' if c['jiazi'] else ' '
+        check_week = 'x' if c['week'] else ' '
+        check_same_day = 'x' if c['same_day'] else ' '
+        time_part_solar = str(timedelta(days=float(c['solar_time'])))[:-7]
+        time_part_lunar = str(timedelta(days=float(c['lunar_time'])))[:-7]
         print('{0:>5}年 {1:>6}月 {2:>7}日 {3:>08}時(年) {4:>08}時(月) [{5}] [{6}] {7:>15.6f} {8:>15.6f} [{9}]'.format(
-            i, j, days, time_part_solar, time_part_lunar, check_jiazi, check_week, solar_days, lunar_days,
-            check_same_day))
+            c['years'], c['months'], c['days'], time_part_solar, time_part_lunar, check_jiazi, check_week,
+            c['solar_days'], c['lunar_days'], check_same_day))
 
 
 if __name__ == "__main__":
@@ -172,6 +159,7 @@ if __name__ == "__main__":
     end = ts.utc(1800, 12, 31)
     # t1 = ts.utc(2999, 12, 31)
     find_new_moon_winter_solstice(begin, end)
+    # find_new_moon_winter_solstice(begin, end, jobs=8)
 
     # find_3034(ts.utc(-3040, 1, 1), ts.utc(-3030, 1, 1))
     # -3039 12 19 611440.5004882407 CalendarTuple(year=-3039, month=12, day=19, hour=22, minute=59, second=19.840786174296227) CalendarTuple(year=-3039, month=12, day=19, hour=3, minute=9, second=13.946844205616799)